@@ -0,0 +1,46 @@
+from collections import deque
+
+class AdaptiveInputSize:
+    """
+    Picks the inference input size from a ladder of sizes to hold a latency
+    budget.
+
+    After each inference, observe() records its latency. Once `window`
+    timings have been collected at the current size, the controller steps
+    down if their median is over `target_latency`. It steps up only if the
+    median, scaled by the pixel-count ratio of the next size, would still be
+    under `headroom * target_latency`. Timings are discarded after every
+    change, so the controller never oscillates faster than once per window.
+    """
+    def __init__(self, target_latency, sizes=(320, 416, 512, 640), window=20, headroom=0.8, initial=None):
+        self.target_latency = target_latency
+        self.sizes = sorted(sizes)
+        self.window = window
+        self.headroom = headroom
+        self.index = self.sizes.index(initial) if initial in self.sizes else len(self.sizes) - 1
+        self.timings = deque(maxlen=window)
+        self.changes = 0
+
+    @property
+    def size(self):
+        return self.sizes[self.index]
+
+    def observe(self, latency):
+        """Record one inference latency (seconds); returns the size to use next"""
+        self.timings.append(latency)
+        if len(self.timings) < self.window:
+            return self.size
+
+        median = sorted(self.timings)[len(self.timings) // 2]
+        if median > self.target_latency and self.index > 0:
+            self._move(-1)
+        elif self.index < len(self.sizes) - 1:
+            scale = (self.sizes[self.index + 1] / self.size) ** 2
+            if median * scale < self.headroom * self.target_latency:
+                self._move(1)
+        return self.size
+
+    def _move(self, step):
+        self.index += step
+        self.timings.clear()
+        self.changes += 1
@@ -0,0 +1,199 @@
+import os
+import shutil
+import sys
+import threading
+import time
+import cv2
+import numpy as np
+from ascii_window import CHAR_LIST, GLYPH_LUT, ascii_indices
+from pipeline import LatestSlot, StageThread
+from startup import StartupReport
+from metrics import MetricsRegistry, start_publisher
+
+CSI = '\x1b['
+GLYPHS = np.array(list(CHAR_LIST))
+
+def ascii_cells(image, cols, rows, color=None):
+    """
+    Glyph indices for a (rows, cols) character grid, plus the 256-color
+    palette index of every character if color is 'gray' or 'rgb' (else None)
+    """
+    if color is None:
+        return ascii_indices(image, cols, rows), None
+
+    small = cv2.resize(image, (cols, rows), interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    if color == 'gray':
+        # 24-step grayscale ramp
+        palette = 232 + gray.astype(np.int16) * 23 // 255
+    else:
+        # 6x6x6 color cube; frames are BGR
+        cube = (small.astype(np.int16) * 5 + 127) // 255
+        palette = 16 + 36 * cube[..., 2] + 6 * cube[..., 1] + cube[..., 0]
+    return GLYPH_LUT[gray], palette
+
+class AnsiFrameEncoder:
+    """
+    Turns successive character grids into ANSI escape sequences that only
+    rewrite what changed.
+
+    The encoder remembers the grid it last emitted. Each changed stretch of
+    a row becomes one cursor move and the run of new characters. Gaps of up
+    to `merge_gap` unchanged characters are rewritten instead of skipped,
+    since that is cheaper than another cursor move. A change in grid size
+    clears the screen and sends everything.
+    """
+    def __init__(self, merge_gap=6):
+        self.merge_gap = merge_gap
+        self.indices = None
+        self.palette = None
+
+    def reset(self):
+        """Forget the emitted grid, so the next frame is sent in full"""
+        self.indices = None
+        self.palette = None
+
+    def encode(self, indices, palette=None):
+        rows, cols = indices.shape
+        full = self.indices is None or self.indices.shape != indices.shape
+        if full:
+            changed = np.ones(indices.shape, dtype=bool)
+        else:
+            changed = indices != self.indices
+            if palette is not None:
+                changed |= palette != self.palette
+
+        out = [CSI + '0m' + CSI + '2J'] if full else []
+        current_color = None
+        for row in np.flatnonzero(changed.any(axis=1)).tolist():
+            columns = np.flatnonzero(changed[row])
+            # Split into runs wherever the gap between changed columns exceeds merge_gap
+            breaks = np.flatnonzero(np.diff(columns) > self.merge_gap + 1)
+            starts = columns[np.concatenate(([0], breaks + 1))].tolist()
+            ends = columns[np.concatenate((breaks, [len(columns) - 1]))].tolist()
+            for start, end in zip(starts, ends):
+                out.append(f'{CSI}{row + 1};{start + 1}H')
+                glyphs = GLYPHS[indices[row, start:end + 1]]
+                if palette is None:
+                    out.append(''.join(glyphs))
+                    continue
+                for glyph, color in zip(glyphs, palette[row, start:end + 1].tolist()):
+                    if color != current_color:
+                        out.append(f'{CSI}38;5;{color}m')
+                        current_color = color
+                    out.append(glyph)
+
+        self.indices = indices.copy()
+        self.palette = None if palette is None else palette.copy()
+        return ''.join(out).encode('ascii')
+
+def terminal_size(output, fallback=(80, 24)):
+    """Character size of the terminal behind output, or fallback for pipes and files"""
+    try:
+        size = os.get_terminal_size(output.fileno())
+        return size.columns, size.lines
+    except (AttributeError, OSError, ValueError):
+        return shutil.get_terminal_size(fallback) if output is sys.stdout else fallback
+
+def run_ascii_terminal(frame_ring, event_bus, output=None, fps=15, color=None, size=None,
+                       metrics_queue=None, control=None):
+    """
+    Headless counterpart of run_ascii_window: streams the ASCII view to a
+    terminal or pipe with ANSI cursor addressing, sending only changed
+    characters.
+
+    output: path or binary file to write to (stdout if None).
+    fps: upper bound on frames written per second.
+    color: None for plain glyphs, 'gray' or 'rgb' for 256-color shading.
+    size: fixed (cols, rows); otherwise follows the terminal size.
+    control: supervisor WorkerControl, beaten once per loop.
+
+    Frames are handed to a writer thread through a LatestSlot. When the
+    output is slow, writes block only that thread and the frames it had no
+    time for are dropped. Each write is a delta against what was actually
+    sent, so a dropped frame never leaves stale characters behind.
+    """
+    startup = StartupReport('ascii terminal')
+    if output is None:
+        stream = sys.stdout
+        out = sys.stdout.buffer
+    elif isinstance(output, str):
+        stream = out = open(output, 'wb', buffering=0)
+    else:
+        stream = out = output
+
+    metrics = MetricsRegistry('ascii_terminal')
+    frame_age = metrics.histogram('capture_to_ascii_seconds', 'Capture to frame picked up from the ring')
+    render_time = metrics.histogram('render_seconds', 'ASCII conversion and delta encoding time')
+    write_time = metrics.histogram('write_seconds', 'Time to write one frame to the output')
+    bytes_written = metrics.counter('bytes_written', 'Bytes of escape sequences written')
+    dropped_frames = metrics.counter('dropped_frames', 'Frames skipped because the output was slow')
+    publisher = start_publisher(metrics, metrics_queue)
+
+    encoder = AnsiFrameEncoder()
+    grid_slot = LatestSlot('terminal')
+    stop_event = threading.Event()
+    frame_interval = 1.0 / fps if fps else 0.0
+
+    def write_step():
+        grid = grid_slot.get(timeout=0.5)
+        if grid is None:
+            return not grid_slot.closed
+        with render_time.time():
+            data = encoder.encode(*grid)
+        if data:
+            with write_time.time():
+                out.write(data)
+                out.flush()
+            bytes_written.inc(len(data))
+        dropped_frames.inc(grid_slot.dropped - dropped_frames.value)
+
+    writer = StageThread('terminal writer', write_step, stop_event)
+    out.write((CSI + '?25l').encode('ascii'))  # hide the cursor
+    writer.start()
+    startup.mark('output')
+    startup.report()
+
+    last_seq = 0
+    next_frame_time = 0.0
+    try:
+        while not stop_event.is_set():
+            if control is not None:
+                control.beat()
+                if control.stop_requested:
+                    break
+            # Cap the frame rate
+            delay = next_frame_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            seq, frame = frame_ring.read_latest(last_seq)
+            if frame is None or frame.size == 0:
+                time.sleep(0.005)
+                continue
+            last_seq = seq
+            next_frame_time = time.perf_counter() + frame_interval
+            capture_time = frame_ring.capture_time(seq)
+            if capture_time is not None:
+                frame_age.observe(time.time() - capture_time)
+
+            cols, rows = size or terminal_size(stream)
+            # Leave the last line free so the terminal does not scroll
+            cells = ascii_cells(frame, cols, max(rows - 1, 1), color)
+            if frame_ring.is_current(seq):
+                grid_slot.put(cells)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        grid_slot.close()
+        writer.join(timeout=1.0)
+        try:
+            out.write((CSI + '0m' + CSI + '?25h\n').encode('ascii'))
+            out.flush()
+        except (BrokenPipeError, OSError):
+            pass
+        if isinstance(output, str):
+            out.close()
+        if publisher is not None:
+            publisher.stop()
+        print(f"ASCII terminal stopped, {grid_slot.dropped} frames dropped", file=sys.stderr)
+        frame_ring.close()
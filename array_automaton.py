@@ -0,0 +1,187 @@
+import time
+import numpy as np
+import pygame
+
+BLACK = (0, 0, 0)
+
+# Marks an empty position in the class_id array
+EMPTY = -1
+
+# The 8 neighbor offsets, in the same order Cell.find_empty_neighbor scans them
+NEIGHBOR_DX = np.array([-1, -1, -1, 0, 0, 1, 1, 1])
+NEIGHBOR_DY = np.array([-1, 0, 1, -1, 1, -1, 0, 1])
+
+# A tick updates the grid in SWEEP x SWEEP interleaved sub-lattices. Cells of one
+# sub-lattice are at least SWEEP apart, so their neighborhoods and move targets
+# never overlap and the whole sub-lattice can move at once.
+SWEEP = 3
+
+def sweep_phases(size):
+    """
+    Sub-lattice phase of each row (or column) of a torus side. Where size is
+    not a multiple of SWEEP, the leftover lines at the seam would sit next to
+    line 0 of the same phase, so each of them gets a phase of its own.
+    """
+    phases = np.arange(size) % SWEEP
+    seam = size - size % SWEEP
+    phases[seam:] = SWEEP + np.arange(size - seam)
+    return phases
+
+def neighbor_counts(occupied):
+    """Number of occupied neighbors of every position on the torus"""
+    counts = np.zeros(occupied.shape, dtype=np.uint8)
+    for dx, dy in zip(NEIGHBOR_DX, NEIGHBOR_DY):
+        counts += np.roll(occupied, shift=(-dy, -dx), axis=(0, 1))
+    return counts
+
+class ArrayEngine:
+    """
+    NumPy implementation of the Cell automaton.
+
+    Occupancy and class_id live in one int16 array (EMPTY for no cell), with
+    boolean arrays for the just_placed and permanent flags. A tick applies the
+    same rule as Cell.update: cells with fewer than 2 or more than 3 neighbors
+    move to a random empty neighbor, and freshly placed cells sit out one tick.
+
+    The reference loop is sequential: each cell sees the moves made before
+    it in the same tick. To stay statistically equivalent, a tick sweeps the
+    9 sub-lattices of cells with the same (y % 3, x % 3) in row-major order,
+    recomputing neighbor counts for the whole torus before each one. Within a
+    sub-lattice no two cells can interact, so the batch update gives the
+    same result as updating those cells one by one. Unlike the reference
+    loop, a cell never moves twice in one tick. When a side is not a multiple
+    of 3, the rows or columns left over at the wrap seam are swept as extra
+    phases of their own (see sweep_phases).
+    """
+
+    def __init__(self, grid_width, grid_height, cell_size=8, seed=None):
+        self.grid_width = grid_width
+        self.grid_height = grid_height
+        self.cell_size = cell_size
+        self.class_ids = np.full((grid_height, grid_width), EMPTY, dtype=np.int16)
+        self.just_placed = np.zeros((grid_height, grid_width), dtype=bool)
+        self.permanent = np.zeros((grid_height, grid_width), dtype=bool)
+        self.last_full_time = None
+        self.rng = np.random.default_rng(seed)
+        # Occupancy as of the last take_dirty(), diffed to find changed positions
+        self.drawn = None
+
+    @property
+    def occupied(self):
+        return self.class_ids != EMPTY
+
+    def resize(self, grid_width, grid_height):
+        """Keep the overlapping top-left region, like resize_grid"""
+        h = min(self.grid_height, grid_height)
+        w = min(self.grid_width, grid_width)
+        for name, fill in (('class_ids', EMPTY), ('just_placed', False), ('permanent', False)):
+            old = getattr(self, name)
+            new = np.full((grid_height, grid_width), fill, dtype=old.dtype)
+            new[:h, :w] = old[:h, :w]
+            setattr(self, name, new)
+        self.grid_width = grid_width
+        self.grid_height = grid_height
+
+    def take_dirty(self):
+        """Positions changed since the last call, or None if everything may have"""
+        occupied = self.occupied
+        drawn, self.drawn = self.drawn, occupied
+        if drawn is None or drawn.shape != occupied.shape:
+            return None
+        ys, xs = np.nonzero(occupied != drawn)
+        return list(zip(xs.tolist(), ys.tolist()))
+
+    def is_occupied(self, x, y):
+        return self.class_ids[y, x] != EMPTY
+
+    def find_random_empty_position(self):
+        """
+        Same contract as find_random_empty_position: if the grid is full, wait
+        30 seconds before clearing non-permanent cells
+        """
+        empty = np.flatnonzero(self.class_ids.ravel() == EMPTY)
+        if empty.size:
+            return self._position(self.rng.choice(empty))
+
+        current_time = time.time()
+        if self.last_full_time is None:
+            self.last_full_time = current_time
+            return None
+        if current_time - self.last_full_time < 30:
+            return None
+
+        self.class_ids[~self.permanent] = EMPTY
+        self.just_placed[~self.permanent] = False
+        empty = np.flatnonzero(self.class_ids.ravel() == EMPTY)
+        return self._position(self.rng.choice(empty)) if empty.size else None
+
+    def _position(self, flat_index):
+        y, x = divmod(int(flat_index), self.grid_width)
+        return x, y
+
+    def place(self, class_id):
+        """Place a new cell at a random empty position. Returns the position or None"""
+        position = self.find_random_empty_position()
+        if position:
+            x, y = position
+            self.class_ids[y, x] = class_id
+            self.just_placed[y, x] = True
+            self.permanent[y, x] = False
+        return position
+
+    def step(self):
+        height, width = self.class_ids.shape
+        class_ids = self.class_ids.reshape(-1)
+        permanent = self.permanent.reshape(-1)
+
+        # Cells placed since the last tick sit this one out; cells that moved are done
+        eligible = ~self.just_placed
+        self.just_placed[:] = False
+        eligible_flat = eligible.reshape(-1)
+
+        rows = sweep_phases(height)[:, None]
+        cols = sweep_phases(width)[None, :]
+
+        for phase_y in np.unique(rows):
+            for phase_x in np.unique(cols):
+                occupied = self.class_ids != EMPTY
+                counts = neighbor_counts(occupied)
+                movers = (occupied & eligible & (rows == phase_y) & (cols == phase_x)
+                          & ((counts < 2) | (counts > 3)))
+                pending = np.flatnonzero(movers)
+                if pending.size == 0:
+                    continue
+
+                # Flat index of each of the 8 neighbors of every mover, shape (8, n)
+                py, px = np.divmod(pending, width)
+                targets = (((py + NEIGHBOR_DY[:, None]) % height) * width
+                           + (px + NEIGHBOR_DX[:, None]) % width)
+                options = class_ids[targets] == EMPTY
+
+                has_option = options.any(axis=0)
+                pending = pending[has_option]
+                targets = targets[:, has_option]
+                options = options[:, has_option]
+                if pending.size == 0:
+                    continue
+
+                # Uniform random choice among each cell's empty neighbors
+                keys = self.rng.random(options.shape)
+                keys[~options] = -1.0
+                chosen = targets[keys.argmax(axis=0), np.arange(pending.size)]
+
+                # Claims can only collide on a grid narrower than SWEEP; pending
+                # is row-major, so the first claim wins
+                _, first = np.unique(chosen, return_index=True)
+                src = pending[first]
+                dst = chosen[first]
+                class_ids[dst] = class_ids[src]
+                permanent[dst] = permanent[src]
+                class_ids[src] = EMPTY
+                permanent[src] = False
+                eligible_flat[dst] = False
+
+    def draw(self, surface):
+        size = self.cell_size
+        for y, x in np.argwhere(self.occupied):
+            pygame.draw.rect(surface, BLACK, (x * size, y * size, size - 1, size - 1))
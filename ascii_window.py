@@ -1,10 +1,18 @@
 import pygame
 import cv2
 import numpy as np
+import time
 from queue import Queue, Empty
+from startup import StartupReport
+from metrics import MetricsRegistry, start_publisher
+
+CHAR_LIST = '@%#*+=-:. '
+
+# Grayscale value -> index into CHAR_LIST, same mapping as ascii_art
+GLYPH_LUT = (np.arange(256) * (len(CHAR_LIST) - 1) // 255).astype(np.intp)
 
 def ascii_art(image, cols, rows):
-    char_list = '@%#*+=-:. '
+    char_list = CHAR_LIST
     
     image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
     processed_image = cv2.resize(image, (cols, rows), interpolation=cv2.INTER_AREA)
@@ -23,7 +31,60 @@ def ascii_art(image, cols, rows):
     
     return ascii_image
 
-def run_ascii_window(frame_queue, person_detected_queue):
+def ascii_indices(image, cols, rows):
+    """
+    Vectorized counterpart of ascii_art: returns a (rows, cols) array of
+    indices into CHAR_LIST instead of row strings
+    """
+    image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    processed_image = cv2.resize(image, (cols, rows), interpolation=cv2.INTER_AREA)
+    return GLYPH_LUT[processed_image]
+
+class GlyphAtlas:
+    """
+    Pre-rendered glyph bitmaps stacked into one array, so a whole ASCII frame
+    is composed with a single fancy-index gather instead of one blit per character.
+    Arrays are in pygame.surfarray order (x, y, rgb).
+    """
+    def __init__(self, font, cell_width, cell_height, chars=CHAR_LIST, color=(255, 255, 255)):
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+        self.glyphs = np.zeros((len(chars), cell_width, cell_height, 3), dtype=np.uint8)
+        tint = np.array(color, dtype=np.float32) / 255
+
+        for i, char in enumerate(chars):
+            # Anti-aliased glyph coverage, tinted with the text color over black
+            glyph = font.render(char, True, color)
+            coverage = pygame.surfarray.array_alpha(glyph)[:cell_width, :cell_height]
+            w, h = coverage.shape
+            self.glyphs[i, :w, :h] = (coverage[:, :, None] * tint).astype(np.uint8)
+
+        self._surface = None
+
+    def compose(self, indices):
+        """Build the (cols * cell_width, rows * cell_height, 3) pixel array for an index grid"""
+        rows, cols = indices.shape
+        tiles = self.glyphs[indices.T]  # (cols, rows, cell_width, cell_height, 3)
+        return tiles.transpose(0, 2, 1, 3, 4).reshape(
+            cols * self.cell_width, rows * self.cell_height, 3)
+
+    def render(self, indices):
+        """Compose an index grid onto a reusable surface and return it"""
+        pixels = self.compose(indices)
+        size = pixels.shape[:2]
+        if self._surface is None or self._surface.get_size() != size:
+            self._surface = pygame.Surface(size)
+        pygame.surfarray.blit_array(self._surface, pixels)
+        return self._surface
+
+def run_ascii_window(frame_ring, event_bus, renderer='atlas', metrics_queue=None, control=None):
+    """
+    renderer: 'atlas' composes each frame from a glyph atlas with NumPy,
+    'blit' is the original per-character blit path. Press 'r' to switch.
+    Stage timings are published through metrics_queue if given; control is
+    the supervisor's WorkerControl, beaten once per frame.
+    """
+    startup = StartupReport('ascii window')
     pygame.init()
     width, height = 800, 600
     screen = pygame.display.set_mode((width, height), pygame.RESIZABLE)
@@ -33,6 +94,12 @@ def run_ascii_window(frame_queue, person_detected_queue):
     
     fps_clock = pygame.time.Clock()
     
+    metrics = MetricsRegistry('ascii')
+    frame_age = metrics.histogram('capture_to_ascii_seconds', 'Capture to frame picked up from the ring')
+    render_time = metrics.histogram('render_seconds', 'ASCII conversion and composition time')
+    blit_time = metrics.histogram('blit_seconds', 'display.flip time')
+    publisher = start_publisher(metrics, metrics_queue)
+    
     # Fixed font size
     font_size = 10
     try:
@@ -41,22 +108,32 @@ def run_ascii_window(frame_queue, person_detected_queue):
         font = pygame.font.SysFont('courier', font_size)
     
     # Pre-render characters
-    char_surfaces = {char: font.render(char, True, (255, 255, 255)) for char in '@%#*+=-:. '}
+    char_surfaces = {char: font.render(char, True, (255, 255, 255)) for char in CHAR_LIST}
     
     # Fixed character dimensions
     char_width = font_size * 0.6
     char_height = font_size + 1
     
+    glyph_atlas = GlyphAtlas(font, int(char_width), char_height)
+    startup.mark('window and glyphs')
+    startup.report()
+    
     fullscreen = False
     original_size = (width, height)
     last_resize_time = pygame.time.get_ticks()
     resize_cooldown = 100
     
     last_valid_frame = None
+    spare_frame = None
+    last_seq = 0
     
     running = True
     while running:
         current_time = pygame.time.get_ticks()
+        if control is not None:
+            control.beat()
+            if control.stop_requested:
+                break
 
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
@@ -68,6 +145,9 @@ def run_ascii_window(frame_queue, person_detected_queue):
                         screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
                     else:
                         screen = pygame.display.set_mode(original_size, pygame.RESIZABLE)
+                elif event.key == pygame.K_r:
+                    renderer = 'blit' if renderer == 'atlas' else 'atlas'
+                    print(f"ASCII renderer: {renderer}")
             elif event.type == pygame.VIDEORESIZE and not fullscreen:
                 if current_time - last_resize_time > resize_cooldown:
                     screen = pygame.display.set_mode((event.w, event.h), pygame.RESIZABLE)
@@ -76,14 +156,20 @@ def run_ascii_window(frame_queue, person_detected_queue):
 
         screen.fill((0, 0, 0))
 
-        try:
-            frame = frame_queue.get_nowait()
-            if frame is not None and frame.size > 0:
-                last_valid_frame = frame
-        except Empty:
-            pass
-        except Exception as e:
-            print(f"Error getting frame: {e}")
+        # Copy the newest frame out of the shared-memory ring: last_valid_frame is rendered
+        # again on later iterations, long after the writer has reused its slot
+        seq, frame = frame_ring.read_latest(last_seq)
+        if frame is not None and frame.size > 0:
+            if spare_frame is None or spare_frame.shape != frame.shape:
+                spare_frame = np.empty_like(frame)
+            np.copyto(spare_frame, frame)
+            last_seq = seq
+            # The copy is whole only if the slot was not rewritten while it was taken
+            if frame_ring.is_current(seq):
+                last_valid_frame, spare_frame = spare_frame, last_valid_frame
+                capture_time = frame_ring.capture_time(seq)
+                if capture_time is not None:
+                    frame_age.observe(time.time() - capture_time)
 
         if last_valid_frame is not None:
             current_w, current_h = screen.get_size()
@@ -93,23 +179,36 @@ def run_ascii_window(frame_queue, person_detected_queue):
             cols = int(current_w / char_width)
             rows = int(current_h / char_height)
             
+            render_start = time.perf_counter()
             try:
-                # Generate ASCII frame
-                ascii_frame = ascii_art(last_valid_frame, cols, rows)
-                
-                # Display ASCII frame
-                for i, line in enumerate(ascii_frame):
-                    y_pos = i * char_height
+                if renderer == 'atlas':
+                    # Compose the whole frame in one gather and push it with a single blit
+                    if cols > 0 and rows > 0:
+                        indices = ascii_indices(last_valid_frame, cols, rows)
+                        screen.blit(glyph_atlas.render(indices), (0, 0))
+                else:
+                    # Generate ASCII frame
+                    ascii_frame = ascii_art(last_valid_frame, cols, rows)
                     
-                    for j, char in enumerate(line):
-                        if char in char_surfaces:
-                            x_pos = j * char_width
-                            screen.blit(char_surfaces[char], (x_pos, y_pos))
+                    # Display ASCII frame
+                    for i, line in enumerate(ascii_frame):
+                        y_pos = i * char_height
+                        
+                        for j, char in enumerate(line):
+                            if char in char_surfaces:
+                                x_pos = j * char_width
+                                screen.blit(char_surfaces[char], (x_pos, y_pos))
                             
             except Exception as e:
                 print(f"Error processing frame: {e}")
+            render_time.observe(time.perf_counter() - render_start)
 
-        pygame.display.flip()
+        with blit_time.time():
+            pygame.display.flip()
         fps_clock.tick(30)
 
+    if publisher is not None:
+        publisher.stop()
+
+    frame_ring.close()
     pygame.quit()
\ No newline at end of file
@@ -0,0 +1,271 @@
+"""
+Run detection over recorded video files, headless and at full core count.
+
+    python batch_detect.py footage/*.mp4 --output detections/ --workers 8
+    python batch_detect.py day.mkv --output detections/ --backend onnxruntime --model-path yolov5n.onnx
+
+Each video is split into chunks that start on keyframes (read from its
+packet list with ffprobe if it is installed, otherwise fixed-size chunks
+that OpenCV seeks into). The chunks are decoded and run through the model by a process pool in which
+every worker loads the model once. Finished chunks are written to
+<output>/<video>.chunks/ as they complete, so an interrupted run resumes
+where it stopped. Once all chunks are done they are merged into
+<output>/<video>.npz:
+
+    detections   DETECTION_DTYPE array for the whole video, seq = frame index
+    frame_count  frames decoded
+    fps          video frame rate, to turn frame indices into timestamps
+    settings     JSON of the video path, backend, model path and confidence
+
+Chunks and outputs carry the same settings. Resuming with different ones,
+or into an output written for another video of the same name, stops with
+an error instead of mixing results.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import subprocess
+import time
+import cv2
+import numpy as np
+from detections import CONFIDENCE_THRESHOLD, DETECTION_DTYPE, to_detection_array
+from inference_backends import create_backend
+from supervisor import THREAD_ENV_VARS
+
+# The model of this pool worker, loaded once by init_worker
+_detector = None
+# Why loading failed; raised from process_chunk, since a Pool restarts workers whose initializer raises
+_init_error = None
+
+def video_info(video):
+    cap = cv2.VideoCapture(video)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open {video}")
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+    cap.release()
+    return frame_count, fps
+
+def keyframe_indices(video):
+    """Frame indices of the keyframes from ffprobe, or None if ffprobe is unavailable or fails"""
+    if shutil.which('ffprobe') is None:
+        return None
+    try:
+        # Packets only, so nothing is decoded
+        result = subprocess.run(
+            ['ffprobe', '-v', 'error', '-select_streams', 'v:0', '-show_entries', 'packet=pts,flags',
+             '-of', 'csv=p=0', video],
+            capture_output=True, text=True, check=True, timeout=600)
+    except (subprocess.SubprocessError, OSError):
+        return None
+    return packet_keyframes(result.stdout.split())
+
+def packet_keyframes(lines):
+    """
+    Keyframe frame indices from ffprobe 'pts,flags' packet lines. Packets
+    come in decode order; sorted by pts their position is the frame index
+    OpenCV seeks to, whatever the stream's start time or frame rate. Raw
+    streams report no pts (N/A) at all, and there decode order is taken as
+    is. Returns None when only some packets have a pts.
+    """
+    packets = [line.split(',', 1) for line in lines if ',' in line]
+    timed = [(int(pts), 'K' in flags) for pts, flags in packets if pts.lstrip('-').isdigit()]
+    if not timed:
+        keyframes = [i for i, (_, flags) in enumerate(packets) if 'K' in flags]
+    elif len(timed) == len(packets):
+        keyframes = [i for i, (_, keyframe) in enumerate(sorted(timed)) if keyframe]
+    else:
+        return None
+    return keyframes or None
+
+def plan_chunks(frame_count, chunk_frames, keyframes=None):
+    """
+    [(start, end)) frame ranges of about chunk_frames frames each. With
+    keyframes, every chunk starts on one, so a worker's seek lands exactly
+    on its first frame instead of decoding forward from the previous keyframe.
+    The last chunk has end None and reads to the end of the video, because
+    frame_count is only the container's estimate; when the container gives
+    none (0 or less), the whole video is one chunk.
+    """
+    if frame_count <= 0:
+        return [(0, None)]
+    if keyframes:
+        starts = [0]
+        for keyframe in keyframes:
+            if keyframe - starts[-1] >= chunk_frames and keyframe < frame_count:
+                starts.append(keyframe)
+    else:
+        starts = list(range(0, frame_count, chunk_frames))
+    return list(zip(starts, starts[1:] + [None]))
+
+def init_worker(backend, model_path, threads):
+    global _detector, _init_error
+    cv2.setNumThreads(threads)
+    try:
+        if backend == 'torch':
+            from model_loader import WEIGHTS_PATH, load_model
+            _detector = create_backend(backend, model=load_model(model_path or WEIGHTS_PATH))
+        else:
+            _detector = create_backend(backend, model_path=model_path or 'yolov5n.onnx', threads=threads)
+    except Exception as e:
+        _init_error = e
+
+def process_chunk(task):
+    """Decode and detect one chunk, then write its detections atomically; returns (task, frames, seconds)"""
+    if _init_error is not None:
+        raise RuntimeError(f"Could not load the model: {_init_error}")
+    video, start, end, chunk_path, batch_size, settings = task
+    started = time.perf_counter()
+    cap = cv2.VideoCapture(video)
+    if start:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+
+    parts = []
+    frames, indices = [], []
+    index = start
+
+    def flush():
+        results = _detector.batch(frames) if len(frames) > 1 else [_detector(frames[0])]
+        for frame_index, raw_detections in zip(indices, results):
+            parts.append(to_detection_array(raw_detections, frame_index, settings['confidence']))
+        frames.clear()
+        indices.clear()
+
+    while end is None or index < end:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+        indices.append(index)
+        index += 1
+        if len(frames) >= batch_size:
+            flush()
+    if frames:
+        flush()
+    cap.release()
+
+    detections = np.concatenate(parts) if parts else np.zeros(0, dtype=DETECTION_DTYPE)
+    temporary = chunk_path + '.tmp.npz'
+    np.savez(temporary, detections=detections, frames=np.array([start, index]), settings=json.dumps(settings))
+    os.replace(temporary, chunk_path)
+    return task, index - start, time.perf_counter() - started
+
+def chunk_path(chunk_dir, start, end):
+    return os.path.join(chunk_dir, f"chunk_{start:09d}_{'eof' if end is None else f'{end:09d}'}.npz")
+
+def stored_settings(path):
+    """Settings a chunk or output file was written with, or None if it has none"""
+    with np.load(path) as stored:
+        return json.loads(str(stored['settings'])) if 'settings' in stored.files else None
+
+def merge_chunks(chunk_paths, output_path, fps, settings):
+    detections, frame_count = [], 0
+    for path in chunk_paths:
+        with np.load(path) as chunk:
+            detections.append(chunk['detections'])
+            frame_count = max(frame_count, int(chunk['frames'][1]))
+    merged = np.concatenate(detections) if detections else np.zeros(0, dtype=DETECTION_DTYPE)
+    merged = merged[np.argsort(merged['seq'], kind='stable')]
+    temporary = output_path + '.tmp.npz'
+    np.savez(temporary, detections=merged, frame_count=frame_count, fps=fps, settings=json.dumps(settings))
+    os.replace(temporary, output_path)
+    return len(merged), frame_count
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('videos', nargs='+')
+    parser.add_argument('--output', required=True, help='Directory for the .npz detection files')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--threads', type=int, default=None,
+                        help='Threads per worker (default: cores / workers)')
+    parser.add_argument('--backend', default='torch', choices=['torch', 'onnxruntime', 'openvino'])
+    parser.add_argument('--model-path', default=None)
+    parser.add_argument('--chunk-seconds', type=float, default=60.0)
+    parser.add_argument('--batch-size', type=int, default=1, help='Frames per forward pass')
+    parser.add_argument('--confidence', type=float, default=CONFIDENCE_THRESHOLD)
+    parser.add_argument('--no-resume', action='store_true', help='Discard finished chunks and start over')
+    args = parser.parse_args()
+
+    # Outputs are named after the video file, so two videos of the same name would share them
+    names = {}
+    for video in args.videos:
+        names.setdefault(os.path.splitext(os.path.basename(video))[0], []).append(video)
+    clashes = [videos for videos in names.values() if len(videos) > 1]
+    if clashes:
+        parser.error("these videos would write the same output, run them with different --output "
+                     "directories: " + "; ".join(", ".join(videos) for videos in clashes))
+
+    os.makedirs(args.output, exist_ok=True)
+    threads = args.threads or max(1, (os.cpu_count() or 1) // args.workers)
+
+    tasks, expected, pending_videos = [], {}, {}
+    for video in args.videos:
+        name = os.path.splitext(os.path.basename(video))[0]
+        output_path = os.path.join(args.output, name + '.npz')
+        chunk_dir = os.path.join(args.output, name + '.chunks')
+        settings = {'video': os.path.abspath(video), 'backend': args.backend,
+                    'model_path': args.model_path, 'confidence': args.confidence}
+        if args.no_resume:
+            shutil.rmtree(chunk_dir, ignore_errors=True)
+        elif os.path.exists(output_path):
+            if stored_settings(output_path) != settings:
+                parser.error(f"{output_path} was written with other settings ({stored_settings(output_path)}); "
+                             f"use the same ones, another --output, or --no-resume to overwrite it")
+            print(f"{video}: already done ({output_path})")
+            continue
+
+        frame_count, fps = video_info(video)
+        if frame_count <= 0:
+            print(f"{video}: warning: the container reports no frame count, reading it as a single chunk")
+        keyframes = keyframe_indices(video)
+        chunks = plan_chunks(frame_count, max(1, int(args.chunk_seconds * (fps or 30))), keyframes)
+        os.makedirs(chunk_dir, exist_ok=True)
+        paths = [chunk_path(chunk_dir, start, end) for start, end in chunks]
+        for path in paths:
+            if os.path.exists(path) and stored_settings(path) != settings:
+                parser.error(f"{path} was made with other settings ({stored_settings(path)}); "
+                             f"resume with the same ones or start over with --no-resume")
+        todo = [(video, start, end, path, args.batch_size, settings)
+                for (start, end), path in zip(chunks, paths) if not os.path.exists(path)]
+        for _, start, end, path, *_ in todo:
+            expected[path] = (end if end is not None else max(frame_count, start)) - start
+        print(f"{video}: {frame_count if frame_count > 0 else 'unknown'} frames at {fps:.1f} FPS, "
+              f"{len(chunks)} {'keyframe-aligned' if keyframes else 'fixed'} chunks, "
+              f"{len(chunks) - len(todo)} already done")
+        tasks.extend(todo)
+        pending_videos[video] = (paths, output_path, chunk_dir, fps, settings)
+
+    if tasks:
+        # Container frame counts are estimates, so this is too
+        total_frames = sum(expected.values())
+        print(f"Processing {len(tasks)} chunks (about {total_frames} frames) with {args.workers} workers "
+              f"x {threads} threads")
+
+        # Workers are spawned with this environment and size their thread pools from it
+        os.environ.update({var: str(threads) for var in THREAD_ENV_VARS})
+        context = multiprocessing.get_context('spawn')
+        started = time.perf_counter()
+        done_frames = 0
+        with context.Pool(args.workers, initializer=init_worker,
+                          initargs=(args.backend, args.model_path, threads)) as pool:
+            for i, (task, frames, seconds) in enumerate(pool.imap_unordered(process_chunk, tasks), 1):
+                video, start, _, path = task[:4]
+                done_frames += frames
+                # Count the chunk as read, however far off its estimate was
+                total_frames += frames - expected[path]
+                elapsed = time.perf_counter() - started
+                rate = done_frames / elapsed if elapsed else 0.0
+                remaining = (total_frames - done_frames) / rate if rate else 0.0
+                print(f"[{i}/{len(tasks)}] {os.path.basename(video)} frames {start}-{start + frames} "
+                      f"in {seconds:.1f}s | {done_frames}/{total_frames} frames, {rate:.1f} FPS, "
+                      f"ETA {remaining / 60:.1f} min")
+
+    for video, (paths, output_path, chunk_dir, fps, settings) in pending_videos.items():
+        count, frame_count = merge_chunks(paths, output_path, fps, settings)
+        shutil.rmtree(chunk_dir, ignore_errors=True)
+        print(f"{video}: {count} detections over {frame_count} frames -> {output_path}")
+
+if __name__ == '__main__':
+    main()
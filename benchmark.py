@@ -0,0 +1,234 @@
+"""
+Headless benchmark of every pipeline stage. Needs no camera or display:
+frames are synthetic (or read from --video) and pygame runs on SDL's dummy driver.
+
+    python benchmark.py --resolutions 640x480 1920x1080 --grids 100x75 480x270 --json bench.json
+    python benchmark.py --stages scale ascii automaton --iterations 200
+
+Reports FPS and p50/p95/p99 latency per stage and configuration, plus the
+peak RSS of the run, as JSON for regression tracking. The JSON is the only
+thing written to stdout; the per-stage table and any other output go to
+stderr, so `python benchmark.py > bench.json` works too.
+"""
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import argparse
+import contextlib
+import json
+import platform
+import random
+import resource
+import sys
+import time
+import cv2
+import numpy as np
+import pygame
+
+from ascii_window import ascii_art, ascii_indices, GlyphAtlas
+from array_automaton import ArrayEngine
+from pygame_visualization import CellEngine, find_random_empty_position
+from yolo_detection import LetterboxCanvas, scale_frame
+
+STAGES = ['inference', 'scale', 'ascii', 'automaton', 'placement']
+
+def parse_size(text):
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+def synthetic_frames(width, height, count=8, seed=0):
+    """A few noisy moving-gradient frames, cycled through by the stages"""
+    rng = np.random.default_rng(seed)
+    xs = np.linspace(0, 255, width, dtype=np.float32)
+    frames = []
+    for i in range(count):
+        gradient = np.roll(xs, i * width // count)[None, :, None]
+        noise = rng.normal(0, 20, (height, width, 3)).astype(np.float32)
+        frames.append(np.clip(gradient + noise, 0, 255).astype(np.uint8))
+    return frames
+
+def video_frames(path, width, height, count=64):
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA))
+    cap.release()
+    if not frames:
+        raise RuntimeError(f"Could not read any frames from {path}")
+    return frames
+
+def measure(stage, params, step, iterations, warmup):
+    """Run step(i) warmup + iterations times and summarize the timed calls"""
+    for i in range(warmup):
+        step(i)
+    latencies = np.empty(iterations)
+    for i in range(iterations):
+        start = time.perf_counter()
+        step(i)
+        latencies[i] = time.perf_counter() - start
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    result = {
+        'stage': stage,
+        'params': params,
+        'iterations': iterations,
+        'fps': float(iterations / latencies.sum()),
+        'mean_ms': float(latencies.mean() * 1000),
+        'p50_ms': float(p50),
+        'p95_ms': float(p95),
+        'p99_ms': float(p99),
+    }
+    print(f"{stage:34s} {json.dumps(params):40s} {result['fps']:9.1f} FPS  "
+          f"p50 {p50:8.3f} ms  p95 {p95:8.3f} ms  p99 {p99:8.3f} ms", file=sys.stderr)
+    return result
+
+def bench_inference(frames, params, args):
+    from inference_backends import create_backend
+    if args.backend == 'torch':
+        from model_loader import load_model
+        backend = create_backend('torch', model=load_model())
+    else:
+        backend = create_backend(args.backend, model_path=args.model_path)
+    params = dict(params, backend=args.backend)
+    return [measure('inference', params, lambda i: backend(frames[i % len(frames)]),
+                    args.iterations, args.warmup)]
+
+def bench_scale(frames, params, args):
+    window = args.window
+    params = dict(params, window=f"{window[0]}x{window[1]}")
+    canvas = LetterboxCanvas()
+    no_boxes = np.zeros((0, 6), dtype=np.float32)
+    return [measure('scale_frame', params,
+                    lambda i: scale_frame(frames[i % len(frames)], window),
+                    args.iterations, args.warmup),
+            measure('letterbox_canvas', params,
+                    lambda i: canvas.render(frames[i % len(frames)], no_boxes, window),
+                    args.iterations, args.warmup)]
+
+def bench_ascii(frames, params, args):
+    # Same character geometry as run_ascii_window
+    font_size = 10
+    char_width, char_height = int(font_size * 0.6), font_size + 1
+    cols, rows = args.window[0] // char_width, args.window[1] // char_height
+    font = pygame.font.SysFont('consolas', font_size)
+    atlas = GlyphAtlas(font, char_width, char_height)
+    params = dict(params, cols=cols, rows=rows)
+
+    return [
+        measure('ascii_art', params, lambda i: ascii_art(frames[i % len(frames)], cols, rows),
+                args.iterations, args.warmup),
+        measure('ascii_atlas', params,
+                lambda i: atlas.render(ascii_indices(frames[i % len(frames)], cols, rows)),
+                args.iterations, args.warmup),
+    ]
+
+def filled_engine(engine_class, grid_width, grid_height, density, seed=0):
+    # CellEngine draws from the random module, ArrayEngine from its own generator
+    random.seed(seed)
+    if engine_class is ArrayEngine:
+        engine = ArrayEngine(grid_width, grid_height, seed=seed)
+    else:
+        engine = engine_class(grid_width, grid_height)
+    for _ in range(int(grid_width * grid_height * density)):
+        engine.place(random.randrange(80))
+    return engine
+
+def bench_automaton(grid, args):
+    grid_width, grid_height = grid
+    params = {'grid': f"{grid_width}x{grid_height}", 'density': args.density}
+    results = []
+    for name, engine_class in (('cells', CellEngine), ('array', ArrayEngine)):
+        engine = filled_engine(engine_class, grid_width, grid_height, args.density)
+        results.append(measure(f'automaton_step[{name}]', params, lambda i: engine.step(),
+                               args.iterations, args.warmup))
+    return results
+
+def bench_placement(grid, args):
+    grid_width, grid_height = grid
+    results = []
+    for density in (args.density, 0.99):
+        params = {'grid': f"{grid_width}x{grid_height}", 'density': density}
+        engine = filled_engine(CellEngine, grid_width, grid_height, density)
+        results.append(measure('find_random_empty_position[scan]', params,
+                               lambda i: find_random_empty_position(engine.grid, grid_width, grid_height, None),
+                               args.iterations, args.warmup))
+        results.append(measure('find_random_empty_position[index]', params,
+                               lambda i: find_random_empty_position(engine.grid, grid_width, grid_height, None,
+                                                                    engine.free_cells),
+                               args.iterations, args.warmup))
+    return results
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    parser.add_argument('--resolutions', nargs='+', type=parse_size, default=[(640, 480), (1920, 1080)])
+    parser.add_argument('--grids', nargs='+', type=parse_size, default=[(100, 75), (480, 270)])
+    parser.add_argument('--window', type=parse_size, default=(800, 600), help='display window size')
+    parser.add_argument('--density', type=float, default=0.3, help='initial grid occupancy')
+    parser.add_argument('--video', default=None, help='video file instead of synthetic frames')
+    parser.add_argument('--backend', default='torch')
+    parser.add_argument('--model-path', default='yolov5n.onnx', help='model for non-torch backends')
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--json', default=None, help='write the report here instead of stdout')
+    args = parser.parse_args()
+
+    # Model loading and startup reports print too; keep stdout for the report
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run(args)
+
+    output = json.dumps(report, indent=2)
+    if args.json:
+        with open(args.json, 'w') as f:
+            f.write(output)
+        print(f"Peak RSS {report['peak_rss_mb']:.1f} MB, report written to {args.json}", file=sys.stderr)
+    else:
+        print(output)
+
+def run(args):
+    pygame.init()
+    pygame.display.set_mode(args.window)
+
+    results = []
+    for width, height in args.resolutions:
+        if args.video:
+            frames = video_frames(args.video, width, height)
+        else:
+            frames = synthetic_frames(width, height)
+        params = {'resolution': f"{width}x{height}"}
+        if 'inference' in args.stages:
+            results += bench_inference(frames, params, args)
+        if 'scale' in args.stages:
+            results += bench_scale(frames, params, args)
+        if 'ascii' in args.stages:
+            results += bench_ascii(frames, params, args)
+
+    for grid in args.grids:
+        if 'automaton' in args.stages:
+            results += bench_automaton(grid, args)
+        if 'placement' in args.stages:
+            results += bench_placement(grid, args)
+
+    pygame.quit()
+
+    return {
+        'timestamp': time.time(),
+        'host': {'platform': platform.platform(), 'python': platform.python_version(),
+                 'cpus': os.cpu_count()},
+        'config': {key: value for key, value in vars(args).items() if key != 'json'},
+        'results': results,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+if __name__ == "__main__":
+    main()
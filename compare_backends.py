@@ -0,0 +1,118 @@
+"""
+Compare inference backends against the eager torch reference.
+
+    python compare_backends.py --video clip.mp4 --onnx yolov5n.onnx --backends torch onnxruntime openvino
+
+Reports per-backend mean latency and FPS, and how closely each backend's
+detections match the torch output (boxes matched by class and IoU >= 0.5).
+"""
+import argparse
+import json
+import time
+import cv2
+import numpy as np
+from detections import box_iou
+from inference_backends import create_backend
+from model_loader import load_model
+
+def load_frames(video, count, size=(640, 480)):
+    """Read up to `count` frames from a video file, or synthesize them if no file is given"""
+    if video is None:
+        rng = np.random.default_rng(0)
+        return [rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8) for _ in range(count)]
+
+    cap = cv2.VideoCapture(video)
+    frames = []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+def match(reference, candidate, iou_threshold=0.5):
+    """Greedy one-to-one matching of same-class boxes; returns (matches, ious)"""
+    if len(reference) == 0 or len(candidate) == 0:
+        return 0, []
+    ious = box_iou(reference[:, :4], candidate[:, :4])
+    ious[reference[:, 5][:, None] != candidate[:, 5][None, :]] = 0
+    matched = []
+    while True:
+        i, j = np.unravel_index(ious.argmax(), ious.shape)
+        if ious[i, j] < iou_threshold:
+            break
+        matched.append(float(ious[i, j]))
+        ious[i, :] = 0
+        ious[:, j] = 0
+    return len(matched), matched
+
+def run_backend(backend, frames, warmup):
+    for frame in frames[:warmup]:
+        backend(frame)
+    outputs, latencies = [], []
+    for frame in frames:
+        start = time.perf_counter()
+        outputs.append(backend(frame))
+        latencies.append(time.perf_counter() - start)
+    return outputs, np.array(latencies)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--video', default=None, help='video file; synthetic frames if omitted')
+    parser.add_argument('--frames', type=int, default=100)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--backends', nargs='+', default=['torch', 'onnxruntime'])
+    parser.add_argument('--onnx', default='yolov5n.onnx', help='model for the onnxruntime/openvino backends')
+    parser.add_argument('--threads', type=int, default=None)
+    parser.add_argument('--json', default=None, help='also write the report to this file')
+    args = parser.parse_args()
+
+    frames = load_frames(args.video, args.frames)
+    print(f"{len(frames)} frames, backends: {', '.join(args.backends)}")
+
+    report = {}
+    reference = None
+    for name in args.backends:
+        if name == 'torch':
+            import torch
+            if args.threads:
+                torch.set_num_threads(args.threads)
+            backend = create_backend(name, model=load_model())
+        else:
+            backend = create_backend(name, model_path=args.onnx, threads=args.threads)
+
+        outputs, latencies = run_backend(backend, frames, args.warmup)
+        entry = {
+            'mean_ms': float(latencies.mean() * 1000),
+            'p95_ms': float(np.percentile(latencies, 95) * 1000),
+            'fps': float(1.0 / latencies.mean()),
+            'detections': int(sum(len(o) for o in outputs)),
+        }
+
+        if reference is None:
+            reference = outputs
+        else:
+            total_matched, total_reference, total_candidate, all_ious = 0, 0, 0, []
+            for ref, out in zip(reference, outputs):
+                matched, ious = match(ref, out)
+                total_matched += matched
+                total_reference += len(ref)
+                total_candidate += len(out)
+                all_ious.extend(ious)
+            entry['recall_vs_reference'] = total_matched / max(total_reference, 1)
+            entry['precision_vs_reference'] = total_matched / max(total_candidate, 1)
+            entry['mean_matched_iou'] = float(np.mean(all_ious)) if all_ious else None
+
+        report[name] = entry
+        accuracy = "  ".join(f"{key}={entry[key]:.3f}" for key in
+                             ('recall_vs_reference', 'precision_vs_reference', 'mean_matched_iou')
+                             if entry.get(key) is not None)
+        print(f"{name:12s} {entry['mean_ms']:7.1f} ms  {entry['fps']:6.1f} FPS  {accuracy}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
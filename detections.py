@@ -0,0 +1,57 @@
+import numpy as np
+
+# One record per detection; a frame's detections travel as a single array of these
+DETECTION_DTYPE = np.dtype([
+    ('bbox', np.float32, 4),     # x1, y1, x2, y2 in frame pixels
+    ('class_id', np.int16),
+    ('confidence', np.float32),
+    ('seq', np.int64),           # frame sequence number
+    ('track_id', np.int32),      # stable id from the tracker, -1 if untracked
+])
+
+CONFIDENCE_THRESHOLD = 0.5
+
+class DetectedObject:
+    __slots__ = ('bbox', 'class_id', 'confidence', 'seq', 'track_id')
+
+    def __init__(self, bbox, class_id, confidence, seq=None, track_id=-1):
+        self.bbox = bbox
+        self.class_id = class_id
+        self.confidence = confidence
+        self.seq = seq
+        self.track_id = track_id
+
+def to_detection_array(raw_detections, seq, threshold=CONFIDENCE_THRESHOLD):
+    """
+    Filter a backend (N, 6) array (x1, y1, x2, y2, confidence, class_id) by
+    confidence and pack the survivors into a DETECTION_DTYPE array, without
+    a Python loop over detections. A seventh column, if present, is the track_id.
+    """
+    rows = raw_detections[raw_detections[:, 4] > threshold]
+    detections = np.empty(len(rows), dtype=DETECTION_DTYPE)
+    detections['bbox'] = rows[:, :4]
+    detections['class_id'] = rows[:, 5]
+    detections['confidence'] = rows[:, 4]
+    detections['seq'] = seq
+    detections['track_id'] = rows[:, 6] if rows.shape[1] > 6 else -1
+    return detections
+
+def detection_objects(detections):
+    """DetectedObject per record, for consumers that want per-object access"""
+    bboxes = detections['bbox']
+    return [DetectedObject(bbox, class_id, confidence, seq, track_id)
+            for bbox, class_id, confidence, seq, track_id in zip(
+                bboxes, detections['class_id'].tolist(), detections['confidence'].tolist(),
+                detections['seq'].tolist(), detections['track_id'].tolist())]
+
+def contains_class(detections, class_id):
+    return bool((detections['class_id'] == class_id).any())
+
+def box_iou(a, b):
+    """IoU matrix between two (N, 4) and (M, 4) xyxy arrays"""
+    top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+    bottom_right = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return intersection / (area_a[:, None] + area_b[None, :] - intersection + 1e-9)
@@ -0,0 +1,142 @@
+import time
+import multiprocessing
+from queue import Empty, Full
+
+# Per state topic, a shared double array: value, update count, time of last change
+VALUE, UPDATES, CHANGED_AT = range(3)
+
+# A process killed while holding a shared lock never releases it, so nobody waits longer than this
+LOCK_TIMEOUT = 0.5
+# Attempts to make room in a full queue before the new item is given up on
+PUT_ATTEMPTS = 8
+
+def put_drop_oldest(queue, item):
+    """
+    Put item on a bounded queue, evicting the oldest entries while it is
+    full. Returns how many items were lost: evicted ones, plus the new one
+    if no room could be made (the reader's lock held by a dead process).
+    """
+    evicted = 0
+    for _ in range(PUT_ATTEMPTS):
+        try:
+            queue.put_nowait(item)
+            return evicted
+        except Full:
+            try:
+                # Waits briefly: the item that filled the queue may still be in its feeder thread
+                queue.get(timeout=LOCK_TIMEOUT / PUT_ATTEMPTS)
+                evicted += 1
+            except Empty:
+                pass
+    return evicted + 1
+
+class Subscription:
+    """
+    One subscriber's bounded event queue. When it is full the oldest event
+    is dropped, so a subscriber that never reads costs at most max_events.
+    Events are (topic, value, seq, timestamp) tuples.
+    """
+    def __init__(self, name, topics, max_events):
+        self.name = name
+        self.topics = set(topics)
+        self.queue = multiprocessing.Queue(maxsize=max_events)
+        # Unlocked: a lost increment is cheaper than a lock a killed publisher can hold
+        self.dropped = multiprocessing.RawValue('L', 0)
+
+    def _deliver(self, event):
+        lost = put_drop_oldest(self.queue, event)
+        if lost:
+            self.dropped.value += lost
+
+    def get(self, timeout=None):
+        """Next event, or None after timeout"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except Empty:
+            return None
+
+    def poll(self):
+        """All pending events, without blocking"""
+        events = []
+        while True:
+            try:
+                events.append(self.queue.get_nowait())
+            except Empty:
+                return events
+
+    def qsize(self):
+        return self.queue.qsize()
+
+class EventBus:
+    """
+    Bounded cross-process pub/sub. Build it, declare topics and subscribers
+    in the main process before starting workers; it is passed to them as a
+    Process argument.
+
+    State topics keep their latest value in shared memory, so get() is a
+    lock-protected read with no queue involved. Publishing a state only emits
+    an event to subscribers when the value changes (edge-triggered, e.g.
+    person entered/left). Event topics emit on every publish.
+    """
+    def __init__(self, max_events=16):
+        self.max_events = max_events
+        self.states = {}
+        self.events = set()
+        self.subscriptions = []
+        # State publishes given up because the topic's lock was not released in time
+        self.lock_timeouts = multiprocessing.RawValue('L', 0)
+
+    def add_state(self, topic, initial=0.0):
+        self.states[topic] = multiprocessing.Array('d', [float(initial), 0.0, 0.0])
+
+    def add_event(self, topic):
+        self.events.add(topic)
+
+    def subscribe(self, name, topics):
+        unknown = set(topics) - set(self.states) - self.events
+        if unknown:
+            raise ValueError(f"Unknown topics {sorted(unknown)}")
+        subscription = Subscription(name, topics, self.max_events)
+        self.subscriptions.append(subscription)
+        return subscription
+
+    def publish(self, topic, value, seq=None, timestamp=None):
+        """Publish to a topic; returns True if subscribers were notified"""
+        timestamp = time.time() if timestamp is None else timestamp
+        state = self.states.get(topic)
+        if state is not None:
+            lock = state.get_lock()
+            if not lock.acquire(timeout=LOCK_TIMEOUT):
+                self.lock_timeouts.value += 1
+                return False
+            try:
+                values = state.get_obj()
+                changed = values[VALUE] != float(value)
+                values[VALUE] = float(value)
+                values[UPDATES] += 1
+                if changed:
+                    values[CHANGED_AT] = timestamp
+            finally:
+                lock.release()
+            if not changed:
+                return False
+        elif topic not in self.events:
+            raise ValueError(f"Unknown topic '{topic}'")
+
+        event = (topic, value, seq, timestamp)
+        for subscription in self.subscriptions:
+            if topic in subscription.topics:
+                subscription._deliver(event)
+        return True
+
+    # Single aligned doubles, read without the lock
+    def get(self, topic):
+        """Latest value of a state topic"""
+        return self.states[topic].get_obj()[VALUE]
+
+    def changed_at(self, topic):
+        """time.time() of the last change of a state topic, 0.0 if never published"""
+        return self.states[topic].get_obj()[CHANGED_AT]
+
+    def dropped(self):
+        return {subscription.name: subscription.dropped.value for subscription in self.subscriptions}
@@ -0,0 +1,64 @@
+"""
+Export the bundled yolov5n.pt to ONNX for the onnxruntime / openvino backends.
+
+    python export_model.py                      # yolov5n.onnx, fixed 640x640 input
+    python export_model.py --dynamic --int8     # dynamic input size, plus yolov5n-int8.onnx
+"""
+import argparse
+import os
+import torch
+from model_loader import load_model
+
+def export_onnx(weights='yolov5n.pt', output=None, img_size=640, dynamic=False, opset=12):
+    output = output or os.path.splitext(weights)[0] + '.onnx'
+
+    hub_model = load_model(weights, autoshape=False)
+    model = getattr(hub_model, 'model', hub_model).float().eval()
+    if hasattr(model, 'fuse'):
+        model = model.fuse()
+
+    # Make the Detect head emit a single (batch, anchors, 85) tensor, as yolov5's own export does
+    for module in model.modules():
+        if type(module).__name__ == 'Detect':
+            module.inplace = False
+            module.dynamic = dynamic
+            module.export = True
+
+    dummy = torch.zeros(1, 3, img_size, img_size)
+    dynamic_axes = None
+    if dynamic:
+        dynamic_axes = {'images': {0: 'batch', 2: 'height', 3: 'width'},
+                        'output0': {0: 'batch', 1: 'anchors'}}
+
+    with torch.no_grad():
+        torch.onnx.export(model, dummy, output, opset_version=opset,
+                          input_names=['images'], output_names=['output0'],
+                          dynamic_axes=dynamic_axes, do_constant_folding=True)
+    print(f"Exported {weights} -> {output}")
+    return output
+
+def quantize_int8(onnx_path, output=None):
+    """Dynamic INT8 weight quantization with ONNX Runtime"""
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    output = output or os.path.splitext(onnx_path)[0] + '-int8.onnx'
+    quantize_dynamic(onnx_path, output, weight_type=QuantType.QUInt8)
+    print(f"Quantized {onnx_path} -> {output}")
+    return output
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--weights', default='yolov5n.pt')
+    parser.add_argument('--output', default=None)
+    parser.add_argument('--img-size', type=int, default=640)
+    parser.add_argument('--dynamic', action='store_true', help='dynamic batch and input size')
+    parser.add_argument('--opset', type=int, default=12)
+    parser.add_argument('--int8', action='store_true', help='also write a dynamically quantized INT8 model')
+    args = parser.parse_args()
+
+    onnx_path = export_onnx(args.weights, args.output, args.img_size, args.dynamic, args.opset)
+    if args.int8:
+        quantize_int8(onnx_path)
+
+if __name__ == "__main__":
+    main()
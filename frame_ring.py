@@ -0,0 +1,135 @@
+import time
+import numpy as np
+from multiprocessing import shared_memory
+
+# Header layout (int64): [latest_seq, then per slot: seq, height, width, channels, capture_time_ns]
+HEADER_LATEST = 0
+SLOT_FIELDS = 5
+
+class FrameRing:
+    """
+    Fixed-size ring of frame slots in shared memory.
+
+    A single writer (the detector) copies each frame into the next slot and
+    then publishes its sequence number. Readers look up the latest sequence
+    number and get a NumPy view straight into shared memory, so no pickling
+    or copying happens on the consumer side. A view stays valid until the
+    writer wraps around to its slot again, which takes `slots - 1` more frames;
+    use `is_current` to check, or copy the view if it must be kept longer.
+    """
+
+    def __init__(self, slots=3, max_shape=(1080, 1920, 3), name=None, create=True):
+        self.slots = slots
+        self.max_shape = tuple(max_shape)
+        self.slot_bytes = int(np.prod(self.max_shape))
+        self._header_bytes = (1 + slots * SLOT_FIELDS) * 8
+        self._owner = create
+        if create:
+            self._shm = shared_memory.SharedMemory(
+                name=name, create=True, size=self._header_bytes + slots * self.slot_bytes)
+        else:
+            self._shm = _attach(name)
+        self._map_header()
+        if create:
+            self._header[:] = 0
+
+    def _map_header(self):
+        self._header = np.ndarray((1 + self.slots * SLOT_FIELDS,), dtype=np.int64,
+                                  buffer=self._shm.buf)
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    # Spawned children receive the ring by name and attach to the same block
+    def __getstate__(self):
+        return {'name': self._shm.name, 'slots': self.slots, 'max_shape': self.max_shape}
+
+    def __setstate__(self, state):
+        self.__init__(slots=state['slots'], max_shape=state['max_shape'],
+                      name=state['name'], create=False)
+
+    def _slot_meta(self, slot):
+        start = 1 + slot * SLOT_FIELDS
+        return self._header[start:start + SLOT_FIELDS]
+
+    def _slot_view(self, slot, shape):
+        offset = self._header_bytes + slot * self.slot_bytes
+        return np.ndarray(shape, dtype=np.uint8, buffer=self._shm.buf, offset=offset)
+
+    def write(self, frame, capture_time=None):
+        """
+        Copy a frame into the next slot and publish it with its capture time
+        (time.time() seconds, defaults to now). Returns its sequence number.
+        """
+        if frame.dtype != np.uint8 or frame.size > self.slot_bytes:
+            raise ValueError(f"Frame {frame.shape} {frame.dtype} does not fit a ring slot "
+                             f"of {self.max_shape} uint8")
+        shape = frame.shape if frame.ndim == 3 else frame.shape + (1,)
+
+        seq = int(self._header[HEADER_LATEST]) + 1
+        slot = seq % self.slots
+        meta = self._slot_meta(slot)
+
+        # Mark the slot as being written so readers holding an old view can tell
+        meta[0] = -1
+        np.copyto(self._slot_view(slot, shape), frame.reshape(shape))
+        meta[1:4] = shape
+        meta[4] = time.time_ns() if capture_time is None else int(capture_time * 1e9)
+        meta[0] = seq
+        self._header[HEADER_LATEST] = seq
+        return seq
+
+    @property
+    def latest_seq(self):
+        return int(self._header[HEADER_LATEST])
+
+    def read_latest(self, last_seq=0):
+        """
+        Return (seq, view) for the newest frame, or (None, None) if nothing
+        newer than `last_seq` has been published.
+        """
+        seq = int(self._header[HEADER_LATEST])
+        if seq == 0 or seq <= last_seq:
+            return None, None
+        view = self.read(seq)
+        return (seq, view) if view is not None else (None, None)
+
+    def read(self, seq):
+        """Read-only view of frame `seq`, or None once the writer has lapped its slot"""
+        slot = seq % self.slots
+        meta = self._slot_meta(slot)
+        if int(meta[0]) != seq:
+            return None
+        height, width, channels = (int(v) for v in meta[1:4])
+        view = self._slot_view(slot, (height, width, channels))
+        view.flags.writeable = False
+        return view
+
+    def capture_time(self, seq):
+        """Capture time (time.time() seconds) of frame `seq`, or None once its slot is reused"""
+        meta = self._slot_meta(seq % self.slots)
+        capture_ns = int(meta[4])
+        return capture_ns / 1e9 if int(meta[0]) == seq else None
+
+    def is_current(self, seq):
+        """True while the slot holding `seq` has not been overwritten."""
+        return int(self._slot_meta(seq % self.slots)[0]) == seq
+
+    def close(self):
+        self._header = None
+        try:
+            self._shm.close()
+        except BufferError:
+            # A caller still holds a view into the block; it is released with the process
+            pass
+        if self._owner:
+            self._owner = False
+            self._shm.unlink()
+
+def _attach(name):
+    try:
+        # Python 3.13+: children must not register the block with the resource tracker
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
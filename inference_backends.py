@@ -0,0 +1,202 @@
+import cv2
+import numpy as np
+
+# COCO class names in yolov5 class_id order
+COCO_CLASSES = [
+    'person', 'bicycle', 'car', 'motorcycle', 'airplane', 'bus', 'train', 'truck', 'boat',
+    'traffic light', 'fire hydrant', 'stop sign', 'parking meter', 'bench', 'bird', 'cat',
+    'dog', 'horse', 'sheep', 'cow', 'elephant', 'bear', 'zebra', 'giraffe', 'backpack',
+    'umbrella', 'handbag', 'tie', 'suitcase', 'frisbee', 'skis', 'snowboard', 'sports ball',
+    'kite', 'baseball bat', 'baseball glove', 'skateboard', 'surfboard', 'tennis racket',
+    'bottle', 'wine glass', 'cup', 'fork', 'knife', 'spoon', 'bowl', 'banana', 'apple',
+    'sandwich', 'orange', 'broccoli', 'carrot', 'hot dog', 'pizza', 'donut', 'cake', 'chair',
+    'couch', 'potted plant', 'bed', 'dining table', 'toilet', 'tv', 'laptop', 'mouse',
+    'remote', 'keyboard', 'cell phone', 'microwave', 'oven', 'toaster', 'sink',
+    'refrigerator', 'book', 'clock', 'vase', 'scissors', 'teddy bear', 'hair drier',
+    'toothbrush',
+]
+
+# Same defaults as the yolov5 hub AutoShape wrapper
+CONF_THRESHOLD = 0.25
+IOU_THRESHOLD = 0.45
+MAX_DETECTIONS = 1000
+
+# Every backend returns an (N, 6) float32 array: x1, y1, x2, y2, confidence, class_id.
+# Backends with dynamic_size = True also honor a per-call input size: backend(frame, size=416)
+# backend.batch(frames, size=None) runs several frames in one forward pass and returns one
+# array per frame; graphs exported without a dynamic batch axis fall back to a loop.
+EMPTY_DETECTIONS = np.zeros((0, 6), dtype=np.float32)
+
+class TorchHubBackend:
+    """
+    Eager PyTorch through the yolov5 hub AutoShape model (the original path).
+    AutoShape takes numpy images as RGB, so the BGR frames are flipped to
+    match what letterbox_blob feeds the exported graphs.
+    """
+    name = 'torch'
+    dynamic_size = True
+
+    def __init__(self, model):
+        self.model = model
+
+    def __call__(self, frame, size=None):
+        rgb = frame[..., ::-1]
+        results = self.model(rgb, size=size) if size else self.model(rgb)
+        return results.xyxy[0].cpu().numpy().astype(np.float32)
+
+    def batch(self, frames, size=None):
+        # AutoShape letterboxes a list of images into one batch tensor
+        rgb = [frame[..., ::-1] for frame in frames]
+        results = self.model(rgb, size=size) if size else self.model(rgb)
+        return [xyxy.cpu().numpy().astype(np.float32) for xyxy in results.xyxy]
+
+class OnnxRuntimeBackend:
+    """yolov5 graph exported by export_model.py, run with ONNX Runtime on CPU"""
+    name = 'onnxruntime'
+
+    def __init__(self, model_path, input_size=640, threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.input_size = _static_size(model_input.shape, input_size)
+        self.dynamic_size = not isinstance(model_input.shape[2], int)
+        self.dynamic_batch = not isinstance(model_input.shape[0], int)
+
+    def __call__(self, frame, size=None):
+        size = size if size and self.dynamic_size else self.input_size
+        blob, ratio, pad = letterbox_blob(frame, size)
+        prediction = self.session.run(None, {self.input_name: blob})[0]
+        return postprocess(prediction[0], ratio, pad, frame.shape)
+
+    def batch(self, frames, size=None):
+        if not self.dynamic_batch:
+            return [self(frame, size) for frame in frames]
+        size = size if size and self.dynamic_size else self.input_size
+        letterboxed = [letterbox_blob(frame, size) for frame in frames]
+        blob = np.concatenate([blob for blob, _, _ in letterboxed])
+        prediction = self.session.run(None, {self.input_name: blob})[0]
+        return [postprocess(rows, ratio, pad, frame.shape)
+                for rows, (_, ratio, pad), frame in zip(prediction, letterboxed, frames)]
+
+class OpenVinoBackend:
+    """yolov5 ONNX graph compiled by OpenVINO for the CPU plugin"""
+    name = 'openvino'
+
+    def __init__(self, model_path, input_size=640, threads=None):
+        import openvino as ov
+
+        core = ov.Core()
+        config = {'PERFORMANCE_HINT': 'LATENCY'}
+        if threads:
+            config['INFERENCE_NUM_THREADS'] = threads
+        model = core.read_model(model_path)
+        input_shape = model.inputs[0].get_partial_shape()
+        height = input_shape[2]
+        self.input_size = height.get_length() if height.is_static else input_size
+        self.dynamic_size = not height.is_static
+        self.dynamic_batch = not input_shape[0].is_static
+        self.compiled = core.compile_model(model, 'CPU', config)
+        self.output = self.compiled.output(0)
+
+    def __call__(self, frame, size=None):
+        size = size if size and self.dynamic_size else self.input_size
+        blob, ratio, pad = letterbox_blob(frame, size)
+        prediction = self.compiled([blob])[self.output]
+        return postprocess(prediction[0], ratio, pad, frame.shape)
+
+    def batch(self, frames, size=None):
+        if not self.dynamic_batch:
+            return [self(frame, size) for frame in frames]
+        size = size if size and self.dynamic_size else self.input_size
+        letterboxed = [letterbox_blob(frame, size) for frame in frames]
+        blob = np.concatenate([blob for blob, _, _ in letterboxed])
+        prediction = self.compiled([blob])[self.output]
+        return [postprocess(rows, ratio, pad, frame.shape)
+                for rows, (_, ratio, pad), frame in zip(prediction, letterboxed, frames)]
+
+BACKENDS = {
+    TorchHubBackend.name: TorchHubBackend,
+    OnnxRuntimeBackend.name: OnnxRuntimeBackend,
+    OpenVinoBackend.name: OpenVinoBackend,
+}
+
+def create_backend(name, **kwargs):
+    """Instantiate a backend by name ('torch', 'onnxruntime' or 'openvino')"""
+    try:
+        backend_class = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown inference backend '{name}', expected one of {sorted(BACKENDS)}")
+    return backend_class(**kwargs)
+
+def _static_size(shape, default):
+    """Input height of an exported graph, or `default` if its spatial axes are dynamic"""
+    try:
+        return int(shape[2])
+    except (TypeError, ValueError, IndexError):
+        return default
+
+def letterbox_blob(frame, size):
+    """
+    Resize a BGR frame into a size x size square padded with gray (as yolov5
+    does) and return the NCHW float32 RGB blob, the scale ratio and the (x, y) padding
+    """
+    height, width = frame.shape[:2]
+    ratio = min(size / height, size / width)
+    new_width, new_height = round(width * ratio), round(height * ratio)
+    pad_x = (size - new_width) / 2
+    pad_y = (size - new_height) / 2
+
+    canvas = np.full((size, size, 3), 114, dtype=np.uint8)
+    left, top = int(round(pad_x - 0.1)), int(round(pad_y - 0.1))
+    canvas[top:top + new_height, left:left + new_width] = cv2.resize(
+        frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+
+    blob = cv2.dnn.blobFromImage(canvas, scalefactor=1 / 255.0, swapRB=True)
+    return blob, ratio, (left, top)
+
+def postprocess(prediction, ratio, pad, frame_shape,
+                conf_threshold=CONF_THRESHOLD, iou_threshold=IOU_THRESHOLD):
+    """
+    Turn raw yolov5 output rows (cx, cy, w, h, objectness, class scores...)
+    into the (N, 6) detection array in frame coordinates, with class-aware NMS
+    """
+    scores = prediction[:, 5:] * prediction[:, 4:5]
+    class_ids = scores.argmax(axis=1)
+    confidences = scores[np.arange(len(scores)), class_ids]
+    keep = (prediction[:, 4] > conf_threshold) & (confidences > conf_threshold)
+    if not keep.any():
+        return EMPTY_DETECTIONS
+
+    boxes = prediction[keep, :4]
+    class_ids = class_ids[keep]
+    confidences = confidences[keep]
+
+    # cx, cy, w, h -> x1, y1, x2, y2
+    xyxy = np.empty_like(boxes)
+    xyxy[:, :2] = boxes[:, :2] - boxes[:, 2:] / 2
+    xyxy[:, 2:] = boxes[:, :2] + boxes[:, 2:] / 2
+
+    # Offset boxes per class so a single NMS pass never suppresses across classes
+    offset = class_ids[:, None] * 4096.0
+    nms_boxes = np.concatenate([xyxy[:, :2] + offset, xyxy[:, 2:] - xyxy[:, :2]], axis=1)
+    indices = cv2.dnn.NMSBoxes(nms_boxes.tolist(), confidences.tolist(),
+                               conf_threshold, iou_threshold, top_k=MAX_DETECTIONS)
+    indices = np.array(indices, dtype=np.intp).reshape(-1)
+
+    # Undo the letterbox and clip to the frame
+    height, width = frame_shape[:2]
+    xyxy = xyxy[indices]
+    xyxy[:, [0, 2]] = ((xyxy[:, [0, 2]] - pad[0]) / ratio).clip(0, width)
+    xyxy[:, [1, 3]] = ((xyxy[:, [1, 3]] - pad[1]) / ratio).clip(0, height)
+
+    detections = np.empty((len(indices), 6), dtype=np.float32)
+    detections[:, :4] = xyxy
+    detections[:, 4] = confidences[indices]
+    detections[:, 5] = class_ids[indices]
+    return detections
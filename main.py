@@ -3,41 +3,155 @@ from multiprocessing import Queue
 from yolo_detection import yolo_detection
 from pygame_visualization import run_visualization
 from ascii_window import run_ascii_window
+from ansi_terminal import run_ascii_terminal
+from frame_ring import FrameRing
+from metrics import MetricsServer
+from event_bus import EventBus
+from multi_camera import MultiCameraDetector
+from motion_gate import MotionGate
+from supervisor import Supervisor, parse_cpu_list
+import threading
+import os
 import time
 
+# Prometheus-text metrics are served on localhost only
+METRICS_PORT = int(os.environ.get('METRICS_PORT', 9464))
+STATS_LOG_INTERVAL = 10.0  # seconds between stats log lines
+# Set to a tty or fifo path (e.g. /dev/pts/3) to stream the ASCII view there
+# with ANSI escapes instead of opening the pygame window; useful without a display
+ASCII_TERMINAL = os.environ.get('ASCII_TERMINAL')
+ASCII_COLOR = os.environ.get('ASCII_COLOR')  # 'gray' or 'rgb' for 256-color shading
+# Append captured frames and detections to this directory (see recording.py)
+RECORD_PATH = os.environ.get('RECORD_PATH')
+# Read frames from this recording directory instead of the camera
+REPLAY_PATH = os.environ.get('REPLAY_PATH')
+# Comma-separated camera indices or video paths, e.g. CAMERAS=0,1,2. Runs them through a
+# shared pool of batching detector workers; the first camera drives the views
+CAMERAS = [int(s) if s.isdigit() else s for s in os.environ['CAMERAS'].split(',')] if os.environ.get('CAMERAS') else None
+DETECTOR_WORKERS = int(os.environ.get('DETECTOR_WORKERS', 2))
+DETECTOR_BACKEND = os.environ.get('DETECTOR_BACKEND', 'torch')
+# Run the model on every Nth frame only and track boxes in between, e.g. DETECT_EVERY=3
+DETECT_EVERY = int(os.environ.get('DETECT_EVERY', 1))
+# 'diff' or 'mog2' to skip inference on frames without motion (see motion_gate.py)
+MOTION_GATE = os.environ.get('MOTION_GATE')
+# Inference budget in seconds, e.g. TARGET_LATENCY=0.05: the input size shrinks from 640
+# towards 320 to hold it. Needs torch or an ONNX graph exported with --dynamic
+TARGET_LATENCY = float(os.environ['TARGET_LATENCY']) if os.environ.get('TARGET_LATENCY') else None
+# Serve detections and frames to remote viewers, e.g. STREAM_ADDRESS=tcp://0.0.0.0:7000;
+# attach with `python net_stream.py view tcp://<host>:7000`
+STREAM_ADDRESS = os.environ.get('STREAM_ADDRESS')
+# Per-process CPU sets and thread budgets, e.g. WORKER_CPUS="detector=0-3;visualization=4;ascii=5"
+# and WORKER_THREADS="detector=4". By default the detector gets all but two cores' worth of
+# threads and the two pygame loops one each, so they stop competing for cores. With CAMERAS
+# the detector threads are split between the pool workers, and 'camera' pins the captures.
+WORKER_CPUS = os.environ.get('WORKER_CPUS', '')
+WORKER_THREADS = os.environ.get('WORKER_THREADS', '')
+
+def worker_settings(text, parse):
+    # "name=value;name=value" -> {name: parse(value)}
+    settings = {}
+    for item in text.split(';'):
+        name, _, value = item.partition('=')
+        if value:
+            settings[name.strip()] = parse(value.strip())
+    return settings
+
+def log_person_events(subscription):
+    # Print person enter/leave transitions from the event bus
+    while True:
+        topic, value, seq, timestamp = subscription.get()
+        camera = f", camera {topic.split('/')[1]}" if '/' in topic else ''
+        print(f"Person {'entered' if value else 'left'} (frame {seq}{camera})")
+
 def main():
     multiprocessing.set_start_method('spawn', force=True)
-    detection_queue = Queue()
-    frame_queue = Queue(maxsize=1)  # Only keep the latest frame
-    person_detected_queue = Queue()
+    metrics_queue = Queue(maxsize=64)
+
+    # Bounded replacement for the old person_detected_queue, which nothing drained
+    event_bus = EventBus()
+    event_bus.add_event('person_placed')  # visualization placed a person cell
+
+    cpus = worker_settings(WORKER_CPUS, parse_cpu_list)
+    threads = {'detector': max(1, (os.cpu_count() or 1) - 2), 'visualization': 1, 'ascii': 1}
+    threads.update(worker_settings(WORKER_THREADS, int))
+
+    # Each worker process gets its own copy of the gate
+    motion_gate = MotionGate(MOTION_GATE) if MOTION_GATE else None
+
+    camera_pool = None
+    if CAMERAS:
+        # Declares person_present/<camera> state topics on the bus
+        camera_pool = MultiCameraDetector(CAMERAS, workers=DETECTOR_WORKERS, backend=DETECTOR_BACKEND,
+                                          threads=max(1, threads['detector'] // DETECTOR_WORKERS),
+                                          detect_every=DETECT_EVERY, motion_gate=motion_gate,
+                                          target_latency=TARGET_LATENCY,
+                                          event_bus=event_bus, metrics_queue=metrics_queue)
+        # The other cameras' detection queues are bounded and just keep their latest results
+        detection_queue = camera_pool.detection_queues[0]
+        frame_ring = camera_pool.frame_rings[0]
+        person_topics = [f'person_present/{i}' for i in range(len(CAMERAS))]
+    else:
+        detection_queue = Queue()
+        frame_ring = FrameRing(slots=3)  # Shared-memory ring, readers always see the latest frame
+        event_bus.add_state('person_present')  # latest value + enter/leave edges
+        person_topics = ['person_present']
+    person_log = event_bus.subscribe('log', person_topics)
+    threading.Thread(target=log_person_events, args=(person_log,), daemon=True).start()
+
+    try:
+        metrics_server = MetricsServer(metrics_queue,
+                                       queues={'detection_queue': detection_queue,
+                                               'person_log_queue': person_log},
+                                       port=METRICS_PORT, log_interval=STATS_LOG_INTERVAL).start()
+    except OSError as e:
+        # Port taken or not allowed: the workers' snapshots just overflow the bounded queue
+        print(f"Could not serve metrics on port {METRICS_PORT} ({e}), running without metrics")
+        metrics_server = None
+
+    supervisor = Supervisor()
+    if camera_pool is not None:
+        camera_pool.add_to(supervisor, cpus=cpus.get('detector'), camera_cpus=cpus.get('camera'))
+    else:
+        # The detector owns the camera and the 'q' key: when it finishes, everything stops
+        detector_options = {'metrics_queue': metrics_queue, 'record': RECORD_PATH, 'backend': DETECTOR_BACKEND,
+                            'threads': threads['detector'], 'stream': STREAM_ADDRESS,
+                            'detect_every': DETECT_EVERY, 'motion_gate': motion_gate,
+                            'target_latency': TARGET_LATENCY}
+        if REPLAY_PATH:
+            detector_options['source'] = REPLAY_PATH
+        supervisor.add('detector', yolo_detection, (detection_queue, frame_ring, event_bus), detector_options,
+                       cpus=cpus.get('detector'), threads=threads['detector'], essential=True)
 
-    print("Starting YOLO detection...")
-    yolo_process = multiprocessing.Process(target=yolo_detection, args=(detection_queue, frame_queue, person_detected_queue))
-    yolo_process.start()
+    supervisor.add('visualization', run_visualization, (detection_queue, event_bus),
+                   {'metrics_queue': metrics_queue},
+                   cpus=cpus.get('visualization'), threads=threads['visualization'])
 
-    print("Starting visualization process...")
-    visualization_process = multiprocessing.Process(target=run_visualization, args=(detection_queue, person_detected_queue))
-    visualization_process.start()
+    if ASCII_TERMINAL:
+        print(f"ASCII view goes to {ASCII_TERMINAL}")
+        supervisor.add('ascii', run_ascii_terminal, (frame_ring, event_bus),
+                       {'output': ASCII_TERMINAL, 'color': ASCII_COLOR, 'metrics_queue': metrics_queue},
+                       cpus=cpus.get('ascii'), threads=threads['ascii'])
+    else:
+        supervisor.add('ascii', run_ascii_window, (frame_ring, event_bus), {'metrics_queue': metrics_queue},
+                       cpus=cpus.get('ascii'), threads=threads['ascii'])
 
-    print("Starting ASCII window process...")
-    ascii_window_process = multiprocessing.Process(target=run_ascii_window, args=(frame_queue, person_detected_queue))
-    ascii_window_process.start()
+    supervisor.start()
+    print("All processes started. Supervising...")
 
-    print("All processes started. Waiting for completion...")
-    
     try:
-        yolo_process.join()
-    except KeyboardInterrupt:
-        print("Keyboard interrupt detected. Terminating processes...")
+        # Shuts the workers down through the stop event on exit or Ctrl-C
+        supervisor.run(keep_running=camera_pool.running if camera_pool is not None else None)
     finally:
-        yolo_process.terminate()
-        visualization_process.terminate()
-        ascii_window_process.terminate()
-        
-        yolo_process.join()
-        visualization_process.join()
-        ascii_window_process.join()
+        if camera_pool is not None:
+            camera_pool.close()
+        else:
+            frame_ring.close()
+        if metrics_server is not None:
+            metrics_server.stop()
 
+    restarts = {name: count for name, count in supervisor.restart_counts().items() if count}
+    if restarts:
+        print(f"Worker restarts: {restarts}")
     print("Main process exiting.")
 
 if __name__ == "__main__":
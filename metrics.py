@@ -0,0 +1,285 @@
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from queue import Empty, Full
+
+# Histogram bucket upper bounds in seconds, from 0.5 ms to 5 s
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is a bisect and two additions"""
+    kind = 'histogram'
+
+    def __init__(self, name, help='', buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.bounds = list(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def time(self):
+        return Timer(self)
+
+    def snapshot(self):
+        return {'kind': self.kind, 'help': self.help, 'bounds': self.bounds,
+                'counts': list(self.counts), 'sum': self.sum, 'count': self.count}
+
+class Timer:
+    """Context manager observing the elapsed wall time of its block"""
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+class Gauge:
+    kind = 'gauge'
+
+    def __init__(self, name, help=''):
+        self.name = name
+        self.help = help
+        self.value = 0.0
+
+    def set(self, value):
+        self.value = value
+
+    def snapshot(self):
+        return {'kind': self.kind, 'help': self.help, 'value': self.value}
+
+class Counter:
+    """
+    Monotonic count. A counter declared with a label name keeps one child
+    counter per label value: counter.labels('person').inc()
+    """
+    kind = 'counter'
+
+    def __init__(self, name, help='', label=None):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.value = 0.0
+        self.children = {}
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def labels(self, value):
+        child = self.children.get(value)
+        if child is None:
+            child = self.children[value] = Counter(self.name, self.help)
+        return child
+
+    def snapshot(self):
+        snapshot = {'kind': self.kind, 'help': self.help, 'value': self.value}
+        if self.label is not None:
+            snapshot['label'] = self.label
+            snapshot['values'] = {str(value): child.value for value, child in list(self.children.items())}
+        return snapshot
+
+class MetricsRegistry:
+    """Metrics of one process, identified by the `process` label"""
+    def __init__(self, process):
+        self.process = process
+        self.metrics = {}
+
+    def _get(self, metric_class, name, help, **kwargs):
+        metric = self.metrics.get(name)
+        if metric is None:
+            metric = self.metrics[name] = metric_class(name, help, **kwargs)
+        return metric
+
+    def histogram(self, name, help='', buckets=DEFAULT_BUCKETS):
+        return self._get(Histogram, name, help, buckets=buckets)
+
+    def gauge(self, name, help=''):
+        return self._get(Gauge, name, help)
+
+    def counter(self, name, help='', label=None):
+        return self._get(Counter, name, help, label=label)
+
+    def snapshot(self):
+        return {'process': self.process, 'time': time.time(),
+                'metrics': {name: metric.snapshot() for name, metric in list(self.metrics.items())}}
+
+def histogram_quantile(snapshot, q):
+    """Estimate a quantile from a histogram snapshot by interpolating inside its bucket"""
+    total = snapshot['count']
+    if total == 0:
+        return None
+    target = q * total
+    cumulative = 0
+    lower = 0.0
+    for bound, count in zip(snapshot['bounds'] + [float('inf')], snapshot['counts']):
+        if count and cumulative + count >= target:
+            if bound == float('inf'):
+                return lower
+            return lower + (bound - lower) * (target - cumulative) / count
+        cumulative += count
+        lower = bound
+    return lower
+
+def render_prometheus(snapshots):
+    """Prometheus text exposition format for a list of registry snapshots"""
+    by_name = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot['metrics'].items():
+            by_name.setdefault(name, []).append((snapshot['process'], metric))
+
+    lines = []
+    for base_name in sorted(by_name):
+        entries = by_name[base_name]
+        kind = entries[0][1]['kind']
+        # Counters are exposed with the conventional _total suffix
+        name = base_name + '_total' if kind == 'counter' and not base_name.endswith('_total') else base_name
+        lines.append(f"# HELP {name} {entries[0][1]['help']}")
+        lines.append(f"# TYPE {name} {kind}")
+        for process, metric in entries:
+            label = f'process="{process}"'
+            if metric['kind'] == 'histogram':
+                cumulative = 0
+                for bound, count in zip(metric['bounds'], metric['counts']):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{label},le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{label},le="+Inf"}} {metric["count"]}')
+                lines.append(f'{name}_sum{{{label}}} {metric["sum"]}')
+                lines.append(f'{name}_count{{{label}}} {metric["count"]}')
+            elif 'label' in metric:
+                for value, count in sorted(metric['values'].items()):
+                    lines.append(f'{name}{{{label},{metric["label"]}="{value}"}} {count}')
+            else:
+                lines.append(f'{name}{{{label}}} {metric["value"]}')
+    return "\n".join(lines) + "\n"
+
+def format_stats(snapshot):
+    """One log line per process: p50/p95 of every histogram and the value of every gauge"""
+    parts = []
+    for name, metric in sorted(snapshot['metrics'].items()):
+        if metric['kind'] == 'histogram':
+            if metric['count']:
+                p50 = histogram_quantile(metric, 0.5) * 1000
+                p95 = histogram_quantile(metric, 0.95) * 1000
+                parts.append(f"{name} p50={p50:.1f}ms p95={p95:.1f}ms n={metric['count']}")
+        elif 'label' in metric:
+            parts.append(f"{name}={sum(metric['values'].values()):g}")
+        else:
+            parts.append(f"{name}={metric['value']:g}")
+    return f"[stats {snapshot['process']}] " + ", ".join(parts)
+
+class MetricsPublisher(threading.Thread):
+    """Child-process side: periodically send the registry snapshot to the main process"""
+    def __init__(self, registry, metrics_queue, interval=1.0):
+        super().__init__(name='metrics-publisher', daemon=True)
+        self.registry = registry
+        self.metrics_queue = metrics_queue
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.publish()
+
+    def publish(self):
+        try:
+            self.metrics_queue.put_nowait(self.registry.snapshot())
+        except Full:
+            pass
+
+    def stop(self):
+        self._stop_event.set()
+        self.publish()
+
+def start_publisher(registry, metrics_queue, interval=1.0):
+    """Start a MetricsPublisher if a metrics queue was given, else return None"""
+    if metrics_queue is None:
+        return None
+    publisher = MetricsPublisher(registry, metrics_queue, interval)
+    publisher.start()
+    return publisher
+
+class MetricsServer:
+    """
+    Main-process side: collects the latest snapshot of every process, samples
+    queue depths, serves them as Prometheus text on http://host:port/metrics
+    and logs a stats line per process every log_interval seconds
+    """
+    def __init__(self, metrics_queue, queues=None, host='127.0.0.1', port=9464, log_interval=10.0):
+        self.metrics_queue = metrics_queue
+        self.queues = queues or {}
+        self.registry = MetricsRegistry('main')
+        self.snapshots = {}
+        self.log_interval = log_interval
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+        server = self
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = render_prometheus(server.collect()).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.http = ThreadingHTTPServer((host, port), Handler)
+        self.threads = [threading.Thread(target=self.http.serve_forever, name='metrics-http', daemon=True),
+                        threading.Thread(target=self._collect_loop, name='metrics-collector', daemon=True)]
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+        host, port = self.http.server_address[:2]
+        print(f"Metrics available at http://{host}:{port}/metrics")
+        return self
+
+    def _sample_queues(self):
+        for name, queue in self.queues.items():
+            try:
+                self.registry.gauge(f"{name}_depth", f"Items waiting in {name}").set(queue.qsize())
+            except NotImplementedError:
+                # qsize() is unavailable on macOS
+                pass
+
+    def collect(self):
+        with self._lock:
+            self._sample_queues()
+            self.snapshots['main'] = self.registry.snapshot()
+            return list(self.snapshots.values())
+
+    def _collect_loop(self):
+        next_log = time.time() + self.log_interval
+        while not self._stop_event.is_set():
+            try:
+                snapshot = self.metrics_queue.get(timeout=0.5)
+                with self._lock:
+                    self.snapshots[snapshot['process']] = snapshot
+            except Empty:
+                pass
+            if self.log_interval and time.time() >= next_log:
+                next_log = time.time() + self.log_interval
+                for snapshot in self.collect():
+                    print(format_stats(snapshot))
+
+    def stop(self):
+        self._stop_event.set()
+        self.http.shutdown()
+        self.http.server_close()
@@ -0,0 +1,40 @@
+import os
+import functools
+
+# The weights bundled with the repo; loading them never touches the network
+WEIGHTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'yolov5n.pt')
+
+def find_yolov5_repo():
+    """
+    Local ultralytics/yolov5 checkout to load the model code from: $YOLOV5_REPO,
+    or the copy torch.hub cached on a previous online run
+    """
+    repo = os.environ.get('YOLOV5_REPO')
+    if repo:
+        return repo
+
+    import torch
+    cached = os.path.join(torch.hub.get_dir(), 'ultralytics_yolov5_master')
+    return cached if os.path.isdir(cached) else None
+
+@functools.lru_cache(maxsize=None)
+def load_model(weights=WEIGHTS_PATH, device='cpu', autoshape=True):
+    """
+    Load yolov5 weights once per process, offline. torch is imported here,
+    not at module level, so processes that never call this don't pay for it.
+    """
+    import torch
+
+    repo = find_yolov5_repo()
+    if repo is not None:
+        model = torch.hub.load(repo, 'custom', path=weights, source='local', autoshape=autoshape)
+    else:
+        # Fall back to the pip-installed yolov5 package, which ships the model code
+        try:
+            import yolov5
+        except ImportError:
+            raise RuntimeError("No local yolov5 code found: set YOLOV5_REPO to a checkout of "
+                               "ultralytics/yolov5 or pip install yolov5")
+        model = yolov5.load(weights, device=device, autoshape=autoshape)
+
+    return model.to(device)
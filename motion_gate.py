@@ -0,0 +1,94 @@
+import cv2
+import numpy as np
+
+class MotionGate:
+    """
+    Cheap check in front of inference: is there enough change in the frame
+    to be worth running the model?
+
+    Frames are downscaled to `scale_width` pixels wide, grayscale and blurred.
+    With method='diff' each one is compared against the last frame that was
+    let through, so slow drift still adds up to a trigger. With method='mog2'
+    an OpenCV MOG2 background model decides which pixels are foreground.
+    A frame passes when the fraction of changed pixels inside the regions of
+    interest reaches `area_threshold`. `max_skip` forces a pass at least
+    every that many frames (0 disables).
+
+    rois: list of (x1, y1, x2, y2) rectangles in 0..1 frame fractions;
+    the whole frame if None.
+    """
+    def __init__(self, method='diff', scale_width=160, pixel_threshold=25, area_threshold=0.01,
+                 rois=None, max_skip=30):
+        if method not in ('diff', 'mog2'):
+            raise ValueError(f"Unknown motion gate method '{method}', expected 'diff' or 'mog2'")
+        self.method = method
+        self.scale_width = scale_width
+        self.pixel_threshold = pixel_threshold
+        self.area_threshold = area_threshold
+        self.rois = rois
+        self.max_skip = max_skip
+
+        self.reference = None
+        self.mask = None
+        self.subtractor = None  # created on first use so the gate stays picklable
+        self.skipped_in_a_row = 0
+        self.passed = 0
+        self.skipped = 0
+        self.last_motion = 0.0
+
+    @property
+    def skip_ratio(self):
+        total = self.passed + self.skipped
+        return self.skipped / total if total else 0.0
+
+    def _prepare(self, frame):
+        height, width = frame.shape[:2]
+        small_size = (self.scale_width, max(1, round(height * self.scale_width / width)))
+        gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        small = cv2.resize(gray, small_size, interpolation=cv2.INTER_AREA)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def _roi_mask(self, shape):
+        if self.rois is None:
+            return None
+        height, width = shape
+        mask = np.zeros(shape, dtype=bool)
+        for x1, y1, x2, y2 in self.rois:
+            mask[int(y1 * height):int(np.ceil(y2 * height)), int(x1 * width):int(np.ceil(x2 * width))] = True
+        return mask
+
+    def _changed(self, small):
+        if self.method == 'mog2':
+            if self.subtractor is None:
+                self.subtractor = cv2.createBackgroundSubtractorMOG2(detectShadows=False)
+            return self.subtractor.apply(small) > 0
+        return cv2.absdiff(small, self.reference) > self.pixel_threshold
+
+    def should_infer(self, frame):
+        small = self._prepare(frame)
+
+        if self.reference is None or self.reference.shape != small.shape:
+            # First frame, or the camera changed resolution
+            self.mask = self._roi_mask(small.shape)
+            self.reference = small
+            if self.method == 'mog2':
+                self._changed(small)
+            return self._pass()
+
+        changed = self._changed(small)
+        if self.mask is not None:
+            changed = changed[self.mask]
+        self.last_motion = float(changed.mean()) if changed.size else 0.0
+
+        if self.last_motion >= self.area_threshold or (self.max_skip and self.skipped_in_a_row >= self.max_skip):
+            self.reference = small
+            return self._pass()
+
+        self.skipped_in_a_row += 1
+        self.skipped += 1
+        return False
+
+    def _pass(self):
+        self.skipped_in_a_row = 0
+        self.passed += 1
+        return True
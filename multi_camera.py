@@ -0,0 +1,324 @@
+import multiprocessing
+import os
+import time
+from queue import Empty, Full
+import cv2
+import numpy as np
+from frame_ring import FrameRing
+from inference_backends import create_backend
+from model_loader import WEIGHTS_PATH, load_model
+from startup import StartupReport
+from metrics import MetricsRegistry, start_publisher
+from detections import contains_class, to_detection_array
+from event_bus import put_drop_oldest
+from recording import ReplayClock
+from tracker import IouTracker
+from adaptive_size import AdaptiveInputSize
+
+BATCH_SIZE_BUCKETS = (1, 2, 3, 4, 6, 8, 12, 16, 24, 32)
+
+def capture_source(source_id, source, frame_ring, request_queue, metrics_queue=None, motion_gate=None,
+                   control=None):
+    """
+    Capture process for one camera or video file. Each frame goes into the
+    source's FrameRing and an inference request (source_id, seq,
+    capture_time) is offered to the shared request queue. When the queue is
+    full the request is dropped: the detector pool is behind, and it will
+    pick up a newer frame of this source soon enough. Video files are paced
+    to their own timestamps, like a camera would deliver them. A frame the
+    optional MotionGate finds static is stored but not offered, so the
+    source keeps its last results. control is the supervisor's
+    WorkerControl, beaten once per frame.
+    """
+    cap = cv2.VideoCapture(source)
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    if not cap.isOpened():
+        print(f"Camera {source_id}: could not open {source!r}")
+        frame_ring.close()
+        return
+    clock = ReplayClock() if isinstance(source, str) and os.path.isfile(source) else None
+
+    metrics = MetricsRegistry(f'camera-{source_id}')
+    read_time = metrics.histogram('read_seconds', 'Camera read time')
+    dropped = metrics.counter('dropped_requests', 'Frames not offered to the pool because it was behind')
+    static_frames = metrics.counter('motion_skipped_frames', 'Static frames not offered to the pool')
+    skip_ratio = metrics.gauge('motion_skip_ratio', 'Fraction of frames skipped by the motion gate')
+    publisher = start_publisher(metrics, metrics_queue)
+
+    try:
+        while control is None or not control.stop_requested:
+            if control is not None:
+                control.beat()
+            with read_time.time():
+                ret, frame = cap.read()
+            if not ret:
+                break
+            if clock is not None:
+                capture_time = clock.stamp(cap.get(cv2.CAP_PROP_POS_MSEC) / 1000)
+            else:
+                capture_time = time.time()
+            seq = frame_ring.write(frame, capture_time)
+            if motion_gate is not None:
+                static = not motion_gate.should_infer(frame)
+                skip_ratio.set(motion_gate.skip_ratio)
+                if static:
+                    static_frames.inc()
+                    continue
+            try:
+                request_queue.put_nowait((source_id, seq, capture_time))
+            except Full:
+                dropped.inc()
+    finally:
+        if publisher is not None:
+            publisher.stop()
+        cap.release()
+        frame_ring.close()
+
+def collect_batch(request_queue, batch_size, max_latency, control=None):
+    """
+    Wait for one request, then keep collecting until batch_size requests are
+    in hand or the oldest one has waited max_latency seconds since capture.
+    Beats control while waiting, since an idle pool is not a hung one.
+    """
+    while control is None or not control.stop_requested:
+        if control is not None:
+            control.beat()
+        try:
+            first = request_queue.get(timeout=0.1)
+            break
+        except Empty:
+            continue
+    else:
+        return []
+
+    batch = [first]
+    deadline = first[2] + max_latency
+    while len(batch) < batch_size:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(request_queue.get(timeout=remaining))
+        except Empty:
+            break
+    return batch
+
+def detector_worker(worker_id, backend, backend_options, frame_rings, request_queue, detection_queues,
+                    batch_size, max_latency, event_bus=None, metrics_queue=None, detect_every=1,
+                    target_latency=None, control=None):
+    """
+    One process of the detector pool. Collects a batch of requests, keeps
+    only the newest frame per source, runs them through backend.batch() in
+    one forward pass and routes each result to its source's detection queue
+    as (seq, capture_time, detections), like yolo_detection does. A full
+    detection queue loses its oldest result. Results of one source can
+    arrive out of order when several workers handle it.
+
+    detect_every > 1 keeps an IouTracker per source, as yolo_detection
+    does: frames the tracker can serve skip the batch. The worker must then
+    see every request of its sources (see MultiCameraDetector).
+
+    target_latency (seconds) adapts the input size to hold that budget for
+    each forward pass, a whole batch, like yolo_detection does per frame.
+    """
+    startup = StartupReport(f'detector pool {worker_id}')
+    if backend == 'torch':
+        detector = create_backend(backend, model=load_model(backend_options.get('model_path') or WEIGHTS_PATH))
+    else:
+        options = dict(backend_options)
+        options.setdefault('model_path', 'yolov5n.onnx')
+        detector = create_backend(backend, **options)
+    startup.mark('model')
+    startup.report()
+
+    metrics = MetricsRegistry(f'detector-pool-{worker_id}')
+    batch_sizes = metrics.histogram('batch_size', 'Frames per forward pass', buckets=BATCH_SIZE_BUCKETS)
+    infer_time = metrics.histogram('infer_seconds', 'Batched model inference time')
+    wait_time = metrics.histogram('capture_to_batch_seconds', 'Capture to start of inference')
+    superseded = metrics.counter('superseded_frames', 'Requests replaced by a newer frame of the same source')
+    stale = metrics.counter('stale_frames', 'Frames overwritten in their ring before they were read')
+    evicted = metrics.counter('evicted_results', 'Results dropped from a full detection queue')
+    tracked_frames = metrics.counter('tracked_frames', 'Frames served by the tracker alone')
+    inference_size = metrics.gauge('inference_size', 'Current inference input size (pixels)')
+    publisher = start_publisher(metrics, metrics_queue)
+
+    size_controller = None
+    if target_latency is not None:
+        if getattr(detector, 'dynamic_size', False):
+            size_controller = AdaptiveInputSize(target_latency)
+            inference_size.set(size_controller.size)
+        else:
+            print(f"Backend '{backend}' has a fixed input size, ignoring target_latency")
+    trackers = {}
+
+    def route(source_id, seq, capture_time, raw_detections):
+        detections = to_detection_array(raw_detections, seq)
+        evicted.inc(put_drop_oldest(detection_queues[source_id], (seq, capture_time, detections)))
+        if event_bus is not None:
+            event_bus.publish(f'person_present/{source_id}', contains_class(detections, 0), seq, capture_time)
+
+    try:
+        while control is None or not control.stop_requested:
+            batch = collect_batch(request_queue, batch_size, max_latency, control)
+            if not batch:
+                continue
+
+            # Latest frame wins per source
+            newest = {}
+            for request in batch:
+                source_id, seq, _ = request
+                if source_id in newest:
+                    superseded.inc()
+                    if newest[source_id][1] > seq:
+                        continue
+                newest[source_id] = request
+
+            requests, frames = [], []
+            for source_id, seq, capture_time in newest.values():
+                ring = frame_rings[source_id]
+                view = ring.read(seq)
+                if view is None:
+                    stale.inc()
+                    continue
+                if detect_every > 1:
+                    tracker = trackers.setdefault(source_id, IouTracker(detect_every))
+                    if not tracker.needs_detection(seq, (view.shape[1], view.shape[0])):
+                        # The tracker needs no pixels, so the frame is not even copied
+                        route(source_id, seq, capture_time, tracker.predict(seq))
+                        tracked_frames.inc()
+                        continue
+                frame = np.array(view)
+                if not ring.is_current(seq):
+                    stale.inc()
+                    continue
+                requests.append((source_id, seq, capture_time))
+                frames.append(frame)
+            if not frames:
+                continue
+
+            now = time.time()
+            for _, _, capture_time in requests:
+                wait_time.observe(now - capture_time)
+            batch_sizes.observe(len(frames))
+            infer_start = time.perf_counter()
+            if size_controller is not None:
+                results = detector.batch(frames, size=size_controller.size)
+            else:
+                results = detector.batch(frames)
+            latency = time.perf_counter() - infer_start
+            infer_time.observe(latency)
+            if size_controller is not None:
+                inference_size.set(size_controller.observe(latency))
+
+            for (source_id, seq, capture_time), raw_detections in zip(requests, results):
+                if source_id in trackers:
+                    raw_detections = trackers[source_id].update(raw_detections, seq)
+                route(source_id, seq, capture_time, raw_detections)
+    finally:
+        if publisher is not None:
+            publisher.stop()
+        for ring in frame_rings:
+            ring.close()
+
+class MultiCameraDetector:
+    """
+    N capture sources feeding a shared pool of detector processes.
+
+    Every source gets a capture process, a FrameRing and its own detection
+    queue carrying the same (seq, capture_time, detections) tuples as
+    yolo_detection's detection_queue, so run_visualization can consume any
+    of them. The detection queues hold at most max_pending results and drop
+    the oldest, so a source nobody reads costs nothing more. With several
+    workers a source's results may arrive out of order; consumers should
+    skip results older than the last one they used, as run_visualization
+    does. Capture processes post requests to one bounded queue. Pool workers
+    batch requests across sources into a single forward pass, flushing
+    a partial batch once its oldest frame has waited max_latency seconds.
+
+    The processes run under a Supervisor (see add_to): crashed or hung
+    cameras and workers are restarted, detector workers are pinned to cpus
+    and each gets a budget of `threads` torch / BLAS / OpenCV threads.
+
+    detect_every > 1 tracks every source between model runs, like
+    yolo_detection. A tracker has to see all frames of its source, so each
+    worker then gets a request queue of its own and serves a fixed share of
+    the sources instead of taking whatever request is next, and there are
+    no more workers than sources.
+
+    motion_gate: optional MotionGate; every capture process runs its own
+    copy and offers only the frames it lets through. target_latency: input
+    size budget per forward pass, see detector_worker.
+
+    Batching needs backend.batch() to run a real batch: the torch backend,
+    or an ONNX graph exported with --dynamic. Static graphs still work,
+    one frame at a time.
+
+    With an event_bus, person presence per source is published to the state
+    topic 'person_present/<source index>'; the topics are declared here, so
+    build the detector before subscribing to them.
+    """
+    def __init__(self, sources, workers=2, backend='torch', model_path=None, threads=None,
+                 batch_size=None, max_latency=0.03, event_bus=None, metrics_queue=None,
+                 max_shape=(1080, 1920, 3), max_pending=8, detect_every=1, motion_gate=None,
+                 target_latency=None):
+        self.sources = list(sources)
+        # More workers than sources would leave a tracker with only part of a source's frames
+        self.workers = min(workers, len(self.sources)) if detect_every > 1 else workers
+        self.backend = backend
+        self.threads = threads
+        self.backend_options = {'model_path': model_path}
+        if threads and backend != 'torch':
+            # torch sizes its pools from the supervisor's thread variables instead
+            self.backend_options['threads'] = threads
+        self.batch_size = batch_size or len(self.sources)
+        self.max_latency = max_latency
+        self.event_bus = event_bus
+        self.metrics_queue = metrics_queue
+        self.detect_every = detect_every
+        self.motion_gate = motion_gate
+        self.target_latency = target_latency
+        self.cameras = []
+
+        # Spare slots so queued frames survive until a worker reads them
+        self.frame_rings = [FrameRing(slots=4, max_shape=max_shape) for _ in self.sources]
+        self.detection_queues = [multiprocessing.Queue(maxsize=max_pending) for _ in self.sources]
+        shards = self.workers if detect_every > 1 else 1
+        self.request_queues = [multiprocessing.Queue(maxsize=2 * len(self.sources)) for _ in range(shards)]
+        if event_bus is not None:
+            for source_id in range(len(self.sources)):
+                event_bus.add_state(f'person_present/{source_id}')
+
+    def add_to(self, supervisor, cpus=None, camera_cpus=None):
+        """
+        Register the capture processes and detector workers with supervisor.
+        Detector workers are essential: the app stops if one keeps failing.
+        A camera that fails is restarted, and one that ends (a video file)
+        is done; see running().
+        """
+        for source_id, source in enumerate(self.sources):
+            self.cameras.append(supervisor.add(
+                f'camera-{source_id}', capture_source,
+                (source_id, source, self.frame_rings[source_id],
+                 self.request_queues[source_id % len(self.request_queues)]),
+                {'metrics_queue': self.metrics_queue, 'motion_gate': self.motion_gate},
+                cpus=camera_cpus, threads=1))
+        for worker_id in range(self.workers):
+            supervisor.add(f'detector-pool-{worker_id}', detector_worker,
+                           (worker_id, self.backend, self.backend_options, self.frame_rings,
+                            self.request_queues[worker_id % len(self.request_queues)],
+                            self.detection_queues, self.batch_size, self.max_latency),
+                           {'event_bus': self.event_bus, 'metrics_queue': self.metrics_queue,
+                            'detect_every': self.detect_every, 'target_latency': self.target_latency},
+                           cpus=cpus, threads=self.threads, essential=True)
+        tracking = f", detecting every {self.detect_every} frames" if self.detect_every > 1 else ''
+        print(f"Pool of {len(self.sources)} cameras and {self.workers} detector workers "
+              f"(batch size {self.batch_size}, max latency {self.max_latency * 1000:.0f} ms{tracking})")
+        return self
+
+    def running(self):
+        """False once every camera has finished or given up, for Supervisor.run's keep_running"""
+        return not all(camera.done for camera in self.cameras)
+
+    def close(self):
+        for ring in self.frame_rings:
+            ring.close()
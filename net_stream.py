@@ -0,0 +1,426 @@
+"""
+Stream detections and frames to remote viewers over TCP or Unix sockets.
+
+On connect the server sends HELLO (b'TOBE', version) and the client
+replies with one byte, a bitmask of the streams it wants (WANT_DETECTIONS,
+WANT_FRAMES). From then on the server sends messages made of a fixed
+MESSAGE header followed by `length` payload bytes:
+
+    detections  little-endian DETECTION_DTYPE records
+    frame       JPEG, or raw uint8 pixels of height x width x channels
+
+Detections are small and are queued per subscriber; past max_pending the
+oldest are dropped. Frames are latest-wins per subscriber: a slow viewer
+skips frames instead of falling behind.
+
+    python net_stream.py view tcp://inference-box:7000 --view visualization
+    python net_stream.py serve recordings/lobby tcp://0.0.0.0:7000
+"""
+import argparse
+import os
+import socket
+import struct
+import threading
+import time
+from collections import deque
+from queue import Empty, Full, Queue
+import cv2
+import numpy as np
+from detections import DETECTION_DTYPE
+from pipeline import LatestSlot
+
+MAGIC = b'TOBE'
+VERSION = 1
+HELLO = struct.Struct('!4sB')
+SUBSCRIBE = struct.Struct('!B')
+# kind, encoding, seq, capture_time, payload length, height, width, channels
+MESSAGE = struct.Struct('!BBqdIHHB')
+
+WANT_DETECTIONS = 1
+WANT_FRAMES = 2
+
+# Message kinds
+DETECTIONS_MESSAGE = 1
+FRAME_MESSAGE = 2
+
+# Frame encodings
+RAW = 0
+JPEG = 1
+
+WIRE_DTYPE = DETECTION_DTYPE.newbyteorder('<')
+
+def parse_address(address):
+    """
+    'tcp://host:port', 'host:port' or 'unix:///path/to.sock' ->
+    (socket family, address for bind/connect)
+    """
+    if address.startswith('unix://'):
+        return socket.AF_UNIX, address[len('unix://'):]
+    if address.startswith('tcp://'):
+        address = address[len('tcp://'):]
+    host, _, port = address.rpartition(':')
+    return socket.AF_INET, (host or '127.0.0.1', int(port))
+
+def encode_detections(seq, capture_time, detections):
+    payload = np.ascontiguousarray(detections).astype(WIRE_DTYPE, copy=False).tobytes()
+    return MESSAGE.pack(DETECTIONS_MESSAGE, RAW, seq, capture_time, len(payload), 0, 0, 0) + payload
+
+def encode_frame(seq, capture_time, frame, jpeg_quality=None):
+    height, width = frame.shape[:2]
+    channels = frame.shape[2] if frame.ndim == 3 else 1
+    if jpeg_quality is None:
+        payload, encoding = np.ascontiguousarray(frame).tobytes(), RAW
+    else:
+        ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+        if not ok:
+            raise ValueError(f"Could not JPEG-encode frame {seq}")
+        payload, encoding = encoded.tobytes(), JPEG
+    return MESSAGE.pack(FRAME_MESSAGE, encoding, seq, capture_time, len(payload),
+                        height, width, channels) + payload
+
+def decode_payload(kind, encoding, height, width, channels, payload):
+    if kind == DETECTIONS_MESSAGE:
+        return np.frombuffer(payload, dtype=WIRE_DTYPE).astype(DETECTION_DTYPE)
+    if encoding == JPEG:
+        return cv2.imdecode(np.frombuffer(payload, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+    frame = np.frombuffer(payload, dtype=np.uint8).reshape(height, width, channels)
+    return frame[:, :, 0] if channels == 1 else frame
+
+def recv_exact(sock, size):
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:])
+        if n == 0:
+            raise ConnectionError("Connection closed")
+        received += n
+    return bytes(buffer)
+
+class Subscriber:
+    """One connected viewer and the thread that sends to it"""
+    def __init__(self, sock, peer, wants, max_pending):
+        self.sock = sock
+        self.peer = peer
+        self.wants = wants
+        self.max_pending = max_pending
+        self.cond = threading.Condition()
+        self.detections = deque()
+        self.frame = None
+        self.closed = False
+        self.dropped_detections = 0
+        self.dropped_frames = 0
+        self.sent_bytes = 0
+
+    def offer_detections(self, message):
+        with self.cond:
+            if len(self.detections) >= self.max_pending:
+                self.detections.popleft()
+                self.dropped_detections += 1
+            self.detections.append(message)
+            self.cond.notify()
+
+    def offer_frame(self, message):
+        with self.cond:
+            if self.frame is not None:
+                self.dropped_frames += 1
+            self.frame = message
+            self.cond.notify()
+
+    def run(self):
+        try:
+            while True:
+                with self.cond:
+                    self.cond.wait_for(lambda: self.detections or self.frame is not None or self.closed)
+                    if self.closed:
+                        return
+                    messages = list(self.detections)
+                    self.detections.clear()
+                    if self.frame is not None:
+                        messages.append(self.frame)
+                        self.frame = None
+                data = b''.join(messages)
+                self.sock.sendall(data)
+                self.sent_bytes += len(data)
+        except OSError:
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+class StreamServer:
+    """
+    Publishes the detection stream, and optionally frames, to any number
+    of remote subscribers.
+
+    publish_detections() and publish_frame() never block on the network.
+    Frames are only encoded when some subscriber wants them, once per frame,
+    on the server's own encoder thread; a newer frame replaces one still
+    waiting to be encoded. jpeg_quality=None sends raw pixels, which is
+    fine over a Unix socket or loopback.
+    """
+    def __init__(self, address, jpeg_quality=80, max_pending=256):
+        self.address = address
+        self.jpeg_quality = jpeg_quality
+        self.max_pending = max_pending
+        self.subscribers = []
+        self._lock = threading.Lock()
+        self._frame_slot = LatestSlot('stream frames')
+        self._listener = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        family, bind_address = parse_address(self.address)
+        if family == socket.AF_UNIX and os.path.exists(bind_address):
+            os.unlink(bind_address)
+        self._listener = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_INET:
+            self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._listener.bind(bind_address)
+        self._listener.listen()
+        threading.Thread(target=self._accept_loop, name='stream accept', daemon=True).start()
+        threading.Thread(target=self._encode_loop, name='stream encoder', daemon=True).start()
+        print(f"Streaming detections on {self.address}")
+        return self
+
+    @property
+    def port(self):
+        """Bound TCP port, useful with port 0"""
+        return self._listener.getsockname()[1]
+
+    def _accept_loop(self):
+        while not self._stopped.is_set():
+            try:
+                sock, peer = self._listener.accept()
+            except OSError:
+                return
+            try:
+                sock.settimeout(5.0)
+                sock.sendall(HELLO.pack(MAGIC, VERSION))
+                (wants,) = SUBSCRIBE.unpack(recv_exact(sock, SUBSCRIBE.size))
+                sock.settimeout(None)
+                if sock.family == socket.AF_INET:
+                    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            except (OSError, struct.error):
+                sock.close()
+                continue
+            subscriber = Subscriber(sock, peer or 'unix', wants, self.max_pending)
+            with self._lock:
+                self.subscribers = [s for s in self.subscribers if not s.closed] + [subscriber]
+            threading.Thread(target=subscriber.run, name=f'stream to {subscriber.peer}', daemon=True).start()
+            print(f"Stream subscriber connected: {subscriber.peer}")
+
+    def _live(self, want):
+        return [s for s in self.subscribers if not s.closed and s.wants & want]
+
+    def publish_detections(self, seq, capture_time, detections):
+        subscribers = self._live(WANT_DETECTIONS)
+        if subscribers:
+            message = encode_detections(seq, capture_time, detections)
+            for subscriber in subscribers:
+                subscriber.offer_detections(message)
+
+    def publish_frame(self, seq, capture_time, frame):
+        if self._live(WANT_FRAMES):
+            self._frame_slot.put((seq, capture_time, frame))
+
+    def _encode_loop(self):
+        while not self._stopped.is_set():
+            item = self._frame_slot.get(timeout=0.5)
+            if item is None:
+                continue
+            message = encode_frame(*item, jpeg_quality=self.jpeg_quality)
+            for subscriber in self._live(WANT_FRAMES):
+                subscriber.offer_frame(message)
+
+    def stats(self):
+        return [{'peer': str(s.peer), 'sent_bytes': s.sent_bytes, 'dropped_frames': s.dropped_frames,
+                 'dropped_detections': s.dropped_detections} for s in self.subscribers]
+
+    def stop(self):
+        self._stopped.set()
+        self._frame_slot.close()
+        if self._listener is not None:
+            self._listener.close()
+        for subscriber in self.subscribers:
+            subscriber.close()
+        family, bind_address = parse_address(self.address)
+        if family == socket.AF_UNIX and os.path.exists(bind_address):
+            os.unlink(bind_address)
+
+class StreamClient:
+    """
+    Remote end of a StreamServer that stands in for the local plumbing.
+
+    detection_queue is a bounded queue.Queue of (seq, capture_time,
+    detections) tuples, like the one run_visualization drains; the oldest
+    entry is dropped when it is full. read_latest(), capture_time(),
+    is_current() and close() mimic FrameRing, so run_ascii_window can read
+    remote frames. The connection is retried until close().
+    """
+    def __init__(self, address, detections=True, frames=False, max_detections=256, retry_interval=1.0):
+        self.address = address
+        self.wants = (WANT_DETECTIONS if detections else 0) | (WANT_FRAMES if frames else 0)
+        self.detection_queue = Queue(maxsize=max_detections)
+        self.retry_interval = retry_interval
+        self.dropped_detections = 0
+        self._lock = threading.Lock()
+        self._frame = None
+        self._frame_seq = 0
+        self._frame_time = None
+        self._sock = None
+        self._closed = threading.Event()
+        self.connected = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._run, name='stream client', daemon=True).start()
+        return self
+
+    def _run(self):
+        family, address = parse_address(self.address)
+        while not self._closed.is_set():
+            try:
+                self._sock = socket.socket(family, socket.SOCK_STREAM)
+                self._sock.connect(address)
+                magic, version = HELLO.unpack(recv_exact(self._sock, HELLO.size))
+                if magic != MAGIC or version != VERSION:
+                    raise ConnectionError(f"Not a detection stream (magic {magic!r}, version {version})")
+                self._sock.sendall(SUBSCRIBE.pack(self.wants))
+                self.connected.set()
+                self._receive(self._sock)
+            except OSError as e:
+                if not self._closed.is_set():
+                    print(f"Stream {self.address}: {e}; retrying in {self.retry_interval:.0f}s")
+            finally:
+                self.connected.clear()
+                self._sock.close()
+            self._closed.wait(self.retry_interval)
+
+    def _receive(self, sock):
+        while True:
+            kind, encoding, seq, capture_time, length, height, width, channels = MESSAGE.unpack(
+                recv_exact(sock, MESSAGE.size))
+            value = decode_payload(kind, encoding, height, width, channels, recv_exact(sock, length))
+            if kind == DETECTIONS_MESSAGE:
+                self._put_detections((seq, capture_time, value))
+            elif kind == FRAME_MESSAGE and value is not None:
+                with self._lock:
+                    self._frame, self._frame_seq, self._frame_time = value, seq, capture_time
+
+    def _put_detections(self, item):
+        while True:
+            try:
+                self.detection_queue.put_nowait(item)
+                return
+            except Full:
+                try:
+                    self.detection_queue.get_nowait()
+                    self.dropped_detections += 1
+                except Empty:
+                    pass
+
+    # FrameRing interface
+    def read_latest(self, last_seq=0):
+        with self._lock:
+            if self._frame is None or self._frame_seq <= last_seq:
+                return None, None
+            return self._frame_seq, self._frame
+
+    def capture_time(self, seq):
+        with self._lock:
+            return self._frame_time if seq == self._frame_seq else None
+
+    def is_current(self, seq):
+        # Received frames are never overwritten in place
+        return True
+
+    def close(self):
+        self._closed.set()
+        if self._sock is not None:
+            try:
+                self._sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+def view(address, view_name):
+    """Run a viewer in this process, fed from a remote stream"""
+    from event_bus import EventBus
+
+    event_bus = EventBus()
+    event_bus.add_event('person_placed')
+    if view_name == 'visualization':
+        from pygame_visualization import run_visualization
+        client = StreamClient(address, detections=True).start()
+        try:
+            run_visualization(client.detection_queue, event_bus)
+        finally:
+            client.close()
+    elif view_name == 'ascii':
+        from ascii_window import run_ascii_window
+        client = StreamClient(address, detections=False, frames=True).start()
+        try:
+            run_ascii_window(client, event_bus)
+        finally:
+            client.close()
+    else:
+        from ansi_terminal import run_ascii_terminal
+        client = StreamClient(address, detections=False, frames=True).start()
+        try:
+            run_ascii_terminal(client, event_bus)
+        finally:
+            client.close()
+
+def serve_recording(path, address, speed, jpeg_quality):
+    """Stream a recording (see recording.py) as if it were live"""
+    from recording import FRAME, RecordingReader, ReplayClock
+
+    reader = RecordingReader(path)
+    server = StreamServer(address, jpeg_quality=jpeg_quality).start()
+    entries = reader.index
+    frame_i = detection_i = 0
+    clock = ReplayClock(speed)
+    try:
+        for entry in entries:
+            if entry['kind'] == FRAME:
+                seq, recorded_time, frame = reader.frame(frame_i)
+                frame_i += 1
+                server.publish_frame(seq, clock.stamp(recorded_time), frame)
+            else:
+                seq, recorded_time, detections = reader.detections(detection_i)
+                detection_i += 1
+                server.publish_detections(seq, clock.stamp(recorded_time), detections)
+        print(f"Streamed {frame_i} frames and {detection_i} detection entries")
+        time.sleep(1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    view_parser = commands.add_parser('view', help='Attach a viewer to a remote stream')
+    view_parser.add_argument('address')
+    view_parser.add_argument('--view', choices=['visualization', 'ascii', 'terminal'], default='visualization')
+    serve_parser = commands.add_parser('serve', help='Stream a recording')
+    serve_parser.add_argument('path')
+    serve_parser.add_argument('address')
+    serve_parser.add_argument('--speed', type=float, default=1.0)
+    serve_parser.add_argument('--jpeg-quality', type=int, default=80)
+    args = parser.parse_args()
+
+    if args.command == 'view':
+        view(args.address, args.view)
+    else:
+        serve_recording(args.path, args.address, args.speed, args.jpeg_quality)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+import threading
+
+class LatestSlot:
+    """
+    Bounded latest-value handoff between two pipeline stages.
+
+    put() never blocks: it replaces any value the consumer has not taken yet
+    and counts it as dropped. get() waits for a value newer than the last one
+    taken, so a slow consumer always works on the freshest item instead of
+    draining a backlog.
+    """
+    def __init__(self, name):
+        self.name = name
+        self._cond = threading.Condition()
+        self._value = None
+        self._seq = 0
+        self._taken_seq = 0
+        self._closed = False
+        self.put_count = 0
+        self.dropped = 0
+
+    def put(self, value):
+        with self._cond:
+            if self._seq > self._taken_seq:
+                self.dropped += 1
+            self._value = value
+            self._seq += 1
+            self.put_count += 1
+            self._cond.notify_all()
+
+    def get(self, timeout=None):
+        """Return the newest untaken value, or None on timeout or after close()"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > self._taken_seq or self._closed, timeout)
+            if self._seq <= self._taken_seq:
+                return None
+            self._taken_seq = self._seq
+            value, self._value = self._value, None
+            return value
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def stats(self):
+        return {'name': self.name, 'put': self.put_count, 'dropped': self.dropped}
+
+class StageThread(threading.Thread):
+    """Daemon thread running `step()` until the stop event is set or `step()` returns False"""
+    def __init__(self, name, step, stop_event):
+        super().__init__(name=name, daemon=True)
+        self.step = step
+        self.stop_event = stop_event
+        self.error = None
+
+    def run(self):
+        try:
+            while not self.stop_event.is_set():
+                if self.step() is False:
+                    break
+        except Exception as e:
+            self.error = e
+            print(f"Error in {self.name} stage: {e}")
+        finally:
+            self.stop_event.set()
@@ -3,51 +3,171 @@ import numpy as np
 from queue import Queue
 import time
 import random
+from collections import deque
+from array_automaton import ArrayEngine
+from startup import StartupReport
+from metrics import MetricsRegistry, start_publisher
+from detections import detection_objects
 
 # Colors
 BLACK = (0, 0, 0)
 WHITE = (255, 255, 255)
 GRID_COLOR = WHITE
 
-def find_random_empty_position(grid, grid_width, grid_height, last_full_time):
+class FreeCellIndex:
+    """
+    Set of empty grid positions with O(1) add, remove and random sample.
+    Positions live in a list; a dict maps each position to its list index so
+    removal can swap the last entry into the hole.
+    """
+    def __init__(self, grid=None, grid_width=0, grid_height=0):
+        self.positions = []
+        self.index = {}
+        if grid is not None:
+            for y in range(grid_height):
+                for x in range(grid_width):
+                    if grid[y][x] is None:
+                        self.add((x, y))
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __contains__(self, position):
+        return position in self.index
+
+    def add(self, position):
+        if position not in self.index:
+            self.index[position] = len(self.positions)
+            self.positions.append(position)
+
+    def remove(self, position):
+        i = self.index.pop(position)
+        last = self.positions.pop()
+        if i < len(self.positions):
+            self.positions[i] = last
+            self.index[last] = i
+
+    def discard(self, position):
+        if position in self.index:
+            self.remove(position)
+
+    def sample(self):
+        return self.positions[random.randrange(len(self.positions))]
+
+    def resize(self, old_width, old_height, new_width, new_height):
+        """
+        Follow a resize_grid call: drop positions that fell outside the grid
+        and add the (empty) positions of the newly exposed region
+        """
+        for y in range(old_height):
+            for x in range(new_width if y < new_height else 0, old_width):
+                self.discard((x, y))
+        for y in range(new_height):
+            for x in range(old_width if y < old_height else 0, new_width):
+                self.add((x, y))
+
+class DetectionSampler:
+    """
+    Bounded pool of detections waiting to be placed, with O(1) add and draw.
+
+    Up to `capacity` detections are kept. Once full, a new detection replaces a
+    random one with probability capacity / seen (reservoir sampling), so the
+    pool stays a uniform sample of what arrived. `seen` is capped at
+    `horizon`, which makes older detections fade out exponentially instead
+    of dominating a long run. It restarts when the pool is drained.
+    draw() removes a random detection by swapping the last one into its place.
+
+    dropped counts detections that were rejected or evicted.
+    """
+    def __init__(self, capacity=256, horizon=2048):
+        self.capacity = capacity
+        self.horizon = max(horizon, capacity) if horizon else None
+        self.items = []
+        self.seen = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, obj):
+        """Offer a detection; returns False if it was not kept"""
+        self.seen += 1
+        if self.horizon:
+            self.seen = min(self.seen, self.horizon)
+        if len(self.items) < self.capacity:
+            self.items.append(obj)
+            return True
+
+        self.dropped += 1
+        i = random.randrange(self.seen)
+        if i < self.capacity:
+            self.items[i] = obj
+            return True
+        return False
+
+    def draw(self):
+        """Remove and return a random detection, or None if there are none"""
+        if not self.items:
+            return None
+        i = random.randrange(len(self.items))
+        obj = self.items[i]
+        last = self.items.pop()
+        if i < len(self.items):
+            self.items[i] = last
+        if not self.items:
+            self.seen = 0
+        return obj
+
+def find_random_empty_position(grid, grid_width, grid_height, last_full_time, free_cells=None):
     """
     Find a random empty position in the grid.
     If grid is full, wait 30 seconds before clearing non-permanent cells.
     Returns a tuple (x, y) of coordinates and the updated last_full_time.
+    If free_cells (a FreeCellIndex kept in sync with the grid) is given, the
+    position is sampled from it in O(1) instead of scanning the grid.
     """
-    empty_positions = []
-    for y in range(grid_height):
-        for x in range(grid_width):
-            if grid[y][x] is None:
-                empty_positions.append((x, y))
-    
-    if empty_positions:
-        return random.choice(empty_positions), None
+    if free_cells is not None:
+        if len(free_cells):
+            return free_cells.sample(), None
     else:
-        current_time = time.time()
-        
-        # If this is the first time we've found the grid full, record the time
-        if last_full_time is None:
-            return None, current_time
-        
-        # If 30 seconds haven't passed since the grid became full, return None
-        if current_time - last_full_time < 30:
-            return None, last_full_time
-        
-        # 30 seconds have passed, clear the grid
-        for y in range(grid_height):
-            for x in range(grid_width):
-                if grid[y][x] is not None and not grid[y][x].permanent:
-                    grid[y][x] = None
-        
-        # Find a new random empty position from the cleared grid
-        new_empty_positions = []
+        empty_positions = []
         for y in range(grid_height):
             for x in range(grid_width):
                 if grid[y][x] is None:
-                    new_empty_positions.append((x, y))
+                    empty_positions.append((x, y))
         
-        return (random.choice(new_empty_positions) if new_empty_positions else None), None
+        if empty_positions:
+            return random.choice(empty_positions), None
+
+    current_time = time.time()
+    
+    # If this is the first time we've found the grid full, record the time
+    if last_full_time is None:
+        return None, current_time
+    
+    # If 30 seconds haven't passed since the grid became full, return None
+    if current_time - last_full_time < 30:
+        return None, last_full_time
+    
+    # 30 seconds have passed, clear the grid
+    for y in range(grid_height):
+        for x in range(grid_width):
+            if grid[y][x] is not None and not grid[y][x].permanent:
+                grid[y][x] = None
+                if free_cells is not None:
+                    free_cells.add((x, y))
+    
+    if free_cells is not None:
+        return (free_cells.sample() if len(free_cells) else None), None
+
+    # Find a new random empty position from the cleared grid
+    new_empty_positions = []
+    for y in range(grid_height):
+        for x in range(grid_width):
+            if grid[y][x] is None:
+                new_empty_positions.append((x, y))
+    
+    return (random.choice(new_empty_positions) if new_empty_positions else None), None
 
 class Cell:
     def __init__(self, grid_x, grid_y, class_id):
@@ -93,7 +213,7 @@ class Cell:
         
         return random.choice(possible_moves) if possible_moves else None
 
-    def update(self, grid, grid_width, grid_height):
+    def update(self, grid, grid_width, grid_height, free_cells=None):
         if self.just_placed:
             self.just_placed = False
             return
@@ -108,6 +228,9 @@ class Cell:
                 new_x, new_y = empty_spot
                 grid[new_y][new_x] = self
                 grid[self.grid_y][self.grid_x] = None
+                if free_cells is not None:
+                    free_cells.remove(empty_spot)
+                    free_cells.add((self.grid_x, self.grid_y))
                 self.grid_x = new_x
                 self.grid_y = new_y
         
@@ -118,6 +241,9 @@ class Cell:
                 new_x, new_y = empty_spot
                 grid[new_y][new_x] = self
                 grid[self.grid_y][self.grid_x] = None
+                if free_cells is not None:
+                    free_cells.remove(empty_spot)
+                    free_cells.add((self.grid_x, self.grid_y))
                 self.grid_x = new_x
                 self.grid_y = new_y
         
@@ -133,8 +259,161 @@ class Cell:
                             self.cell_size - 1, 
                             self.cell_size - 1))
 
-def run_visualization(detection_queue, person_detected_queue):
+def resize_grid(grid, new_grid_width, new_grid_height):
+    """
+    Copy the overlapping top-left region of grid into a grid of the new size,
+    updating the coordinates of the cells that survive
+    """
+    new_grid = [[None for x in range(new_grid_width)] for y in range(new_grid_height)]
+    
+    for y in range(min(len(grid), new_grid_height)):
+        for x in range(min(len(grid[0]), new_grid_width)):
+            new_grid[y][x] = grid[y][x]
+            if new_grid[y][x] is not None:
+                new_grid[y][x].grid_x = x
+                new_grid[y][x].grid_y = y
+    
+    return new_grid
+
+class CellEngine:
+    """
+    Reference automaton: a list-of-lists grid of Cell objects, updated one
+    cell at a time in row-major order
+    """
+    def __init__(self, grid_width, grid_height):
+        self.grid_width = grid_width
+        self.grid_height = grid_height
+        self.grid = [[None for x in range(grid_width)] for y in range(grid_height)]
+        self.free_cells = FreeCellIndex(self.grid, grid_width, grid_height)
+        self.last_full_time = None
+        # Positions changed since the last take_dirty(); None means redraw everything
+        self.dirty = None
+
+    def resize(self, grid_width, grid_height):
+        self.grid = resize_grid(self.grid, grid_width, grid_height)
+        self.free_cells.resize(self.grid_width, self.grid_height, grid_width, grid_height)
+        self.grid_width = grid_width
+        self.grid_height = grid_height
+        self.dirty = None
+
+    def _mark(self, position):
+        if self.dirty is not None:
+            self.dirty.add(position)
+
+    def take_dirty(self):
+        """Positions changed since the last call, or None if everything may have"""
+        dirty, self.dirty = self.dirty, set()
+        return dirty
+
+    def is_occupied(self, x, y):
+        cell = self.grid[y][x]
+        return cell is not None and cell.alive
+
+    def place(self, class_id):
+        """Place a new cell at a random empty position. Returns the position or None"""
+        free_before = len(self.free_cells)
+        position, new_last_full_time = find_random_empty_position(
+            self.grid, self.grid_width, self.grid_height, self.last_full_time, self.free_cells)
+        if new_last_full_time is not None:
+            self.last_full_time = new_last_full_time
+        if len(self.free_cells) > free_before:
+            # The full grid was cleared
+            self.dirty = None
+        
+        if position:
+            x, y = position
+            self.grid[y][x] = Cell(x, y, class_id)
+            self.free_cells.remove(position)
+            self._mark(position)
+        return position
+
+    def step(self):
+        for y in range(self.grid_height):
+            for x in range(self.grid_width):
+                cell = self.grid[y][x]
+                if cell is not None:
+                    cell.update(self.grid, self.grid_width, self.grid_height, self.free_cells)
+                    if (cell.grid_x, cell.grid_y) != (x, y):
+                        self._mark((x, y))
+                        self._mark((cell.grid_x, cell.grid_y))
+
+    def draw(self, surface):
+        for y in range(self.grid_height):
+            for x in range(self.grid_width):
+                if self.grid[y][x] is not None and self.grid[y][x].alive:
+                    self.grid[y][x].draw(surface)
+
+class GridRenderer:
+    """
+    Draws an automaton engine onto the window with dirty rectangles.
+
+    The white background and grid lines are rendered once per window size
+    into a cached surface. Each frame only the positions the engine reports
+    through take_dirty() are restored from that surface and redrawn, and
+    only their rectangles are pushed to the display. A full redraw happens
+    after a resize, an expose, a grid clear, or when more than max_rects
+    positions changed at once.
+    """
+    def __init__(self, cell_size, max_rects=2000):
+        self.cell_size = cell_size
+        self.max_rects = max_rects
+        self.background = None
+
+    def resize(self, size):
+        width, height = size
+        self.background = pygame.Surface(size)
+        self.background.fill(WHITE)
+        for x in range(0, width, self.cell_size):
+            pygame.draw.line(self.background, GRID_COLOR, (x, 0), (x, height))
+        for y in range(0, height, self.cell_size):
+            pygame.draw.line(self.background, GRID_COLOR, (0, y), (width, y))
+
+    def invalidate(self):
+        """Force a full redraw on the next frame"""
+        self.background = None
+
+    def draw(self, screen, automaton):
+        """
+        Bring screen up to date with automaton. Returns None if nothing changed,
+        True if the whole screen was redrawn, else the list of dirty rectangles
+        """
+        dirty = automaton.take_dirty()
+        if self.background is None or self.background.get_size() != screen.get_size():
+            self.resize(screen.get_size())
+            dirty = None
+
+        if dirty is None or len(dirty) > self.max_rects:
+            screen.blit(self.background, (0, 0))
+            automaton.draw(screen)
+            return True
+        if not dirty:
+            return None
+
+        size = self.cell_size
+        rects = []
+        for x, y in dirty:
+            rect = pygame.Rect(x * size, y * size, size, size)
+            screen.blit(self.background, rect, rect)
+            if automaton.is_occupied(x, y):
+                pygame.draw.rect(screen, BLACK, (x * size, y * size, size - 1, size - 1))
+            rects.append(rect)
+        return rects
+
+def run_visualization(detection_queue, event_bus, engine='cells', metrics_queue=None, control=None):
+    """
+    engine: 'cells' runs the reference Cell-object grid, 'array' runs the
+    NumPy engine from array_automaton (suited to large fullscreen grids)
+
+    detection_queue carries (seq, capture_time, detections) tuples, with
+    detections as a DETECTION_DTYPE array. Results older than the newest
+    one already taken are skipped: a detector pool can deliver them out of
+    order. Age is judged by capture time, because seq starts over when a
+    stream or replay restarts. Stage
+    timings are published through metrics_queue if given. control is the
+    supervisor's WorkerControl, beaten once per frame.
+    """
     print("Visualization process starting...")
+    startup = StartupReport('visualization')
     
     try:
         pygame.init()
@@ -156,38 +435,57 @@ def run_visualization(detection_queue, person_detected_queue):
         pygame.display.set_icon(icon)
         pygame.display.set_caption("to mature")
         print("Pygame window created.")
+        startup.mark('window')
+        startup.report()
 
         # Track fullscreen state
         is_fullscreen = False
         windowed_size = (width, height)
 
         # Initialize empty grid
-        grid = [[None for x in range(grid_width)] for y in range(grid_height)]
-        
-        # Initialize last_full_time
-        last_full_time = None
+        if engine == 'array':
+            automaton = ArrayEngine(grid_width, grid_height, cell_size)
+        else:
+            automaton = CellEngine(grid_width, grid_height)
         
         # Initialize batching variables
-        detection_buffer = []
+        detection_buffer = DetectionSampler()
+        # Recently seen tracker ids, so a tracked object is only buffered on its first sighting
+        seen_track_ids = set()
+        seen_track_order = deque()
+        max_seen_tracks = 1024
         last_batch_process_time = time.time()
         batch_interval = 1.0  # Adjust this value to control how often cells are placed (in seconds)
         
+        metrics = MetricsRegistry('visualization')
+        ipc_latency = metrics.histogram('capture_to_visualization_seconds', 'Capture to detections received')
+        step_time = metrics.histogram('automaton_step_seconds', 'Automaton update time')
+        draw_time = metrics.histogram('draw_seconds', 'Grid and cell drawing time')
+        blit_time = metrics.histogram('blit_seconds', 'display.flip / display.update time')
+        buffer_depth = metrics.gauge('detection_buffer_depth', 'Detections waiting to be placed')
+        detections_seen = metrics.counter('detections_seen', 'Detections offered to the buffer, per class_id',
+                                          label='class')
+        detections_dropped = metrics.counter('detections_dropped', 'Detections rejected or evicted from the full buffer')
+        stale_results = metrics.counter('stale_results', 'Results older than one already taken from the queue')
+        last_capture_time = 0.0
+        publisher = start_publisher(metrics, metrics_queue)
+
         clock = pygame.time.Clock()
         last_detection_time = {}
         detection_timeout = 1.0
         update_interval = 100  # 1 second between updates
         last_update_time = pygame.time.get_ticks()
 
-        # Draw grid lines
-        def draw_grid():
-            for x in range(0, width, cell_size):
-                pygame.draw.line(screen, GRID_COLOR, (x, 0), (x, height))
-            for y in range(0, height, cell_size):
-                pygame.draw.line(screen, GRID_COLOR, (0, y), (width, y))
+        renderer = GridRenderer(cell_size)
+        expose_events = (pygame.VIDEOEXPOSE, getattr(pygame, 'WINDOWEXPOSED', pygame.VIDEOEXPOSE))
 
         running = True
         while running:
             dt = clock.tick(60) / 1000.0
+            if control is not None:
+                control.beat()
+                if control.stop_requested:
+                    break
 
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
@@ -206,65 +504,49 @@ def run_visualization(detection_queue, person_detected_queue):
                             screen = pygame.display.set_mode((width, height), pygame.RESIZABLE)
                         
                         # Update grid dimensions
-                        new_grid_width = width // cell_size
-                        new_grid_height = height // cell_size
-                        new_grid = [[None for x in range(new_grid_width)] for y in range(new_grid_height)]
-                        
-                        for y in range(min(len(grid), new_grid_height)):
-                            for x in range(min(len(grid[0]), new_grid_width)):
-                                new_grid[y][x] = grid[y][x]
-                                if new_grid[y][x] is not None:
-                                    new_grid[y][x].grid_x = x
-                                    new_grid[y][x].grid_y = y
-                        
-                        grid = new_grid
-                        grid_width = new_grid_width
-                        grid_height = new_grid_height
+                        automaton.resize(width // cell_size, height // cell_size)
+                        renderer.invalidate()
                         
                 elif event.type == pygame.VIDEORESIZE and not is_fullscreen:
                     width, height = event.size
                     screen = pygame.display.set_mode((width, height), pygame.RESIZABLE)
-                    new_grid_width = width // cell_size
-                    new_grid_height = height // cell_size
-                    
-                    new_grid = [[None for x in range(new_grid_width)] for y in range(new_grid_height)]
-                    
-                    for y in range(min(len(grid), new_grid_height)):
-                        for x in range(min(len(grid[0]), new_grid_width)):
-                            new_grid[y][x] = grid[y][x]
-                            if new_grid[y][x] is not None:
-                                new_grid[y][x].grid_x = x
-                                new_grid[y][x].grid_y = y
-                    
-                    grid = new_grid
-                    grid_width = new_grid_width
-                    grid_height = new_grid_height
+                    automaton.resize(width // cell_size, height // cell_size)
+                    renderer.invalidate()
+                elif event.type in expose_events:
+                    renderer.invalidate()
 
             # Process detection queue into buffer
+            dropped_before = detection_buffer.dropped
             while not detection_queue.empty():
-                detected_objects = detection_queue.get()
-                detection_buffer.extend(detected_objects)
+                seq, capture_time, detections = detection_queue.get()
+                if capture_time < last_capture_time:
+                    stale_results.inc()
+                    continue
+                last_capture_time = capture_time
+                ipc_latency.observe(time.time() - capture_time)
+                for obj in detection_objects(detections):
+                    if obj.track_id >= 0:
+                        if obj.track_id in seen_track_ids:
+                            continue
+                        seen_track_ids.add(obj.track_id)
+                        seen_track_order.append(obj.track_id)
+                        if len(seen_track_order) > max_seen_tracks:
+                            seen_track_ids.discard(seen_track_order.popleft())
+                    detection_buffer.add(obj)
+                    detections_seen.labels(obj.class_id).inc()
+            buffer_depth.set(len(detection_buffer))
+            detections_dropped.inc(detection_buffer.dropped - dropped_before)
 
             # Process single detection from buffer at intervals
             current_time = time.time()
             if current_time - last_batch_process_time >= batch_interval and detection_buffer:
-                # Process just one detection from the buffer
-                obj = random.choice(detection_buffer)
+                # Take just one random detection out of the buffer
+                obj = detection_buffer.draw()
                 
                 if obj.class_id == 0:  # Person detection
-                    person_detected_queue.put(True)
+                    event_bus.publish('person_placed', True, obj.seq, current_time)
                 
-                position, new_last_full_time = find_random_empty_position(grid, grid_width, grid_height, last_full_time)
-                if new_last_full_time is not None:
-                    last_full_time = new_last_full_time
-                
-                if position:
-                    x, y = position
-                    new_cell = Cell(x, y, obj.class_id)
-                    grid[y][x] = new_cell
-                
-                # Remove the processed detection from buffer
-                detection_buffer.remove(obj)
+                automaton.place(obj.class_id)
                 
                 last_batch_process_time = current_time
 
@@ -272,25 +554,24 @@ def run_visualization(detection_queue, person_detected_queue):
             current_tick = pygame.time.get_ticks()
             if current_tick - last_update_time >= update_interval:
                 # Update all cells
-                for y in range(grid_height):
-                    for x in range(grid_width):
-                        cell = grid[y][x]
-                        if cell is not None:
-                            cell.update(grid, grid_width, grid_height)
+                with step_time.time():
+                    automaton.step()
                 
                 last_update_time = current_tick
 
-            # Draw
-            screen.fill(WHITE)
-            draw_grid()
-            
-            # Draw cells
-            for y in range(grid_height):
-                for x in range(grid_width):
-                    if grid[y][x] is not None and grid[y][x].alive:
-                        grid[y][x].draw(screen)
+            # Draw only what changed since the last frame
+            with draw_time.time():
+                updated = renderer.draw(screen, automaton)
+
+            if updated is not None:
+                with blit_time.time():
+                    if updated is True:
+                        pygame.display.flip()
+                    else:
+                        pygame.display.update(updated)
 
-            pygame.display.flip()
+        if publisher is not None:
+            publisher.stop()
 
     except Exception as e:
         print(f"Error in visualization process: {e}")
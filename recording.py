@@ -0,0 +1,328 @@
+"""
+Record and replay of captured frames and detections.
+
+A recording is a directory of three append-only files:
+
+    frames.dat      frame payloads, raw pixels or JPEG
+    detections.dat  DETECTION_DTYPE records, back to back
+    index.dat       one INDEX_DTYPE record per frame or detection entry
+
+Payloads are written before their index record, so a reader never sees an
+entry whose data is incomplete, even while the recording is still growing.
+Readers memory-map all three files and decode entries on demand.
+
+    python recording.py info LOG
+    python recording.py replay LOG --view visualization --speed 0
+"""
+import argparse
+import os
+import threading
+import time
+import cv2
+import numpy as np
+from detections import DETECTION_DTYPE
+
+FRAMES_FILE = 'frames.dat'
+DETECTIONS_FILE = 'detections.dat'
+INDEX_FILE = 'index.dat'
+
+# Entry kinds
+FRAME = 0
+DETECTIONS = 1
+
+# Frame encodings
+RAW = 0
+JPEG = 1
+
+INDEX_DTYPE = np.dtype([
+    ('kind', np.uint8),
+    ('encoding', np.uint8),
+    ('seq', np.int64),
+    ('capture_time_ns', np.int64),
+    ('offset', np.int64),        # byte offset into frames.dat or detections.dat
+    ('length', np.int64),        # payload bytes
+    ('shape', np.int32, 3),      # frame height, width, channels
+])
+
+class Recorder:
+    """
+    Appends frames and detection arrays to a recording directory.
+
+    jpeg_quality: compress frames as JPEG at this quality (1-100); raw
+    pixels if None. The capture and inference threads may both write, so
+    appends are serialized with a lock.
+    """
+    def __init__(self, path, jpeg_quality=None):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.jpeg_quality = jpeg_quality
+        self._lock = threading.Lock()
+        self._frames = open(os.path.join(path, FRAMES_FILE), 'ab')
+        self._detections = open(os.path.join(path, DETECTIONS_FILE), 'ab')
+        self._index = open(os.path.join(path, INDEX_FILE), 'ab')
+        self._entry = np.zeros(1, dtype=INDEX_DTYPE)
+        self.frames_written = 0
+        self.detections_written = 0
+
+    def write_frame(self, seq, capture_time, frame):
+        shape = frame.shape if frame.ndim == 3 else frame.shape + (1,)
+        if self.jpeg_quality is None:
+            payload, encoding = np.ascontiguousarray(frame).data, RAW
+        else:
+            ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            if not ok:
+                raise ValueError(f"Could not JPEG-encode frame {seq}")
+            payload, encoding = encoded.data, JPEG
+        with self._lock:
+            self._append(self._frames, FRAME, encoding, seq, capture_time, payload, shape)
+            self.frames_written += 1
+
+    def write_detections(self, seq, capture_time, detections):
+        payload = np.ascontiguousarray(detections, dtype=DETECTION_DTYPE).data
+        with self._lock:
+            self._append(self._detections, DETECTIONS, RAW, seq, capture_time, payload, (0, 0, 0))
+            self.detections_written += 1
+
+    def _append(self, data_file, kind, encoding, seq, capture_time, payload, shape):
+        offset = data_file.tell()
+        data_file.write(payload)
+        data_file.flush()
+        entry = self._entry[0]
+        entry['kind'] = kind
+        entry['encoding'] = encoding
+        entry['seq'] = seq
+        entry['capture_time_ns'] = int(capture_time * 1e9)
+        entry['offset'] = offset
+        entry['length'] = payload.nbytes
+        entry['shape'] = shape
+        self._index.write(self._entry.tobytes())
+        self._index.flush()
+
+    def close(self):
+        with self._lock:
+            for f in (self._frames, self._detections, self._index):
+                f.close()
+
+def _map(path, dtype):
+    """Read-only memmap of a whole file, or an empty array if it has no data yet"""
+    if not os.path.exists(path) or os.path.getsize(path) < dtype.itemsize:
+        return np.zeros(0, dtype=dtype)
+    count = os.path.getsize(path) // dtype.itemsize
+    return np.memmap(path, dtype=dtype, mode='r', shape=(count,))
+
+class RecordingReader:
+    """Memory-mapped view of a recording; call refresh() to see entries appended since"""
+    def __init__(self, path):
+        if not os.path.exists(os.path.join(path, INDEX_FILE)):
+            raise FileNotFoundError(f"No recording at {path}")
+        self.path = path
+        self.refresh()
+
+    def refresh(self):
+        self.index = _map(os.path.join(self.path, INDEX_FILE), INDEX_DTYPE)
+        self._frame_data = _map(os.path.join(self.path, FRAMES_FILE), np.dtype(np.uint8))
+        self._detection_data = _map(os.path.join(self.path, DETECTIONS_FILE), np.dtype(np.uint8))
+        self.frame_entries = self.index[self.index['kind'] == FRAME]
+        self.detection_entries = self.index[self.index['kind'] == DETECTIONS]
+
+    def frame(self, i):
+        """(seq, capture_time, frame) of the i-th recorded frame. Raw frames are read-only views"""
+        entry = self.frame_entries[i]
+        data = self._frame_data[entry['offset']:entry['offset'] + entry['length']]
+        if entry['encoding'] == JPEG:
+            frame = cv2.imdecode(np.asarray(data), cv2.IMREAD_UNCHANGED)
+        else:
+            frame = data.reshape(tuple(entry['shape']))
+        if frame.ndim == 3 and frame.shape[2] == 1:
+            frame = frame[:, :, 0]
+        return int(entry['seq']), entry['capture_time_ns'] / 1e9, frame
+
+    def detections(self, i):
+        """(seq, capture_time, detections) of the i-th detection entry"""
+        entry = self.detection_entries[i]
+        data = self._detection_data[entry['offset']:entry['offset'] + entry['length']]
+        return int(entry['seq']), entry['capture_time_ns'] / 1e9, data.view(DETECTION_DTYPE)
+
+    def fps(self):
+        times = self.frame_entries['capture_time_ns']
+        if len(times) < 2:
+            return 0.0
+        return (len(times) - 1) / ((times[-1] - times[0]) / 1e9)
+
+class ReplayClock:
+    """
+    Paces a replay against recorded capture times. speed=1.0 is real time,
+    2.0 twice as fast; 0 or None never waits. stamp() maps a recorded time
+    onto the replay's own timeline, so latency metrics downstream stay
+    meaningful.
+    """
+    def __init__(self, speed=1.0):
+        self.speed = speed
+        self.start = None
+        self.first = None
+
+    def stamp(self, recorded_time):
+        now = time.time()
+        if self.start is None:
+            self.start, self.first = now, recorded_time
+        if not self.speed:
+            return now
+        due = self.start + (recorded_time - self.first) / self.speed
+        if due > now:
+            time.sleep(due - now)
+        return due
+
+class ReplayCapture:
+    """
+    Stand-in for cv2.VideoCapture reading the frames of a recording. Only
+    the calls yolo_detection makes are supported. loop=True starts over at
+    the end, on a fresh timeline.
+    """
+    def __init__(self, path, speed=1.0, loop=False):
+        self.reader = RecordingReader(path)
+        self.speed = speed
+        self.loop = loop
+        self.clock = ReplayClock(speed)
+        self.position = 0
+        self.last_capture_time = None
+        self._opened = True
+
+    def isOpened(self):
+        return self._opened
+
+    def read(self):
+        if not self._opened:
+            return False, None
+        if self.position >= len(self.reader.frame_entries):
+            if not self.loop or self.position == 0:
+                return False, None
+            self.position = 0
+            self.clock = ReplayClock(self.speed)
+        _, recorded_time, frame = self.reader.frame(self.position)
+        self.position += 1
+        self.last_capture_time = self.clock.stamp(recorded_time)
+        # Hand out a private copy, like a real capture
+        return True, np.array(frame)
+
+    def get(self, prop):
+        entries = self.reader.frame_entries
+        if prop == cv2.CAP_PROP_FPS:
+            return self.reader.fps()
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(len(entries))
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.position)
+        if prop in (cv2.CAP_PROP_FRAME_HEIGHT, cv2.CAP_PROP_FRAME_WIDTH) and len(entries):
+            height, width = entries[0]['shape'][:2]
+            return float(height if prop == cv2.CAP_PROP_FRAME_HEIGHT else width)
+        return 0.0
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            self.position = int(value)
+            self.clock = ReplayClock(self.speed)
+            return True
+        return False
+
+    def release(self):
+        self._opened = False
+
+def replay_detections(path, detection_queue, speed=1.0, stop_event=None):
+    """
+    Feed the recorded (seq, capture_time, detections) tuples into
+    detection_queue, paced like ReplayCapture. Returns the number sent.
+    """
+    reader = RecordingReader(path)
+    clock = ReplayClock(speed)
+    for i in range(len(reader.detection_entries)):
+        if stop_event is not None and stop_event.is_set():
+            return i
+        seq, recorded_time, detections = reader.detections(i)
+        detection_queue.put((seq, clock.stamp(recorded_time), np.array(detections)))
+    return len(reader.detection_entries)
+
+def replay_frames(path, frame_ring, speed=1.0, loop=False, stop_event=None):
+    """Write the recorded frames into frame_ring, paced like ReplayCapture"""
+    capture = ReplayCapture(path, speed, loop)
+    count = 0
+    while stop_event is None or not stop_event.is_set():
+        ret, frame = capture.read()
+        if not ret:
+            break
+        frame_ring.write(frame, capture.last_capture_time)
+        count += 1
+    return count
+
+def info(path):
+    reader = RecordingReader(path)
+    frames = reader.frame_entries
+    print(f"{path}: {len(frames)} frames, {len(reader.detection_entries)} detection entries")
+    if len(frames):
+        duration = (frames['capture_time_ns'][-1] - frames['capture_time_ns'][0]) / 1e9
+        encodings = 'JPEG' if (frames['encoding'] == JPEG).all() else 'raw'
+        height, width, channels = frames[0]['shape']
+        print(f"  {width}x{height}x{channels} {encodings}, {duration:.1f}s at {reader.fps():.1f} FPS, "
+              f"{reader._frame_data.nbytes / 1e6:.1f} MB of frame data")
+    if len(reader.detection_entries):
+        total = int(reader.detection_entries['length'].sum()) // DETECTION_DTYPE.itemsize
+        print(f"  {total} detections")
+
+def replay(path, view, speed, loop):
+    """Drive run_visualization or run_ascii_window from a recording, without camera or model"""
+    import multiprocessing
+    from multiprocessing import Queue
+    from event_bus import EventBus
+    from frame_ring import FrameRing
+
+    multiprocessing.set_start_method('spawn', force=True)
+    event_bus = EventBus()
+    event_bus.add_state('person_present')
+    event_bus.add_event('person_placed')
+
+    stop_event = threading.Event()
+    if view == 'visualization':
+        from pygame_visualization import run_visualization
+        detection_queue = Queue()
+        process = multiprocessing.Process(target=run_visualization, args=(detection_queue, event_bus))
+        feed = lambda: replay_detections(path, detection_queue, speed, stop_event)
+        cleanup = lambda: None
+    else:
+        from ascii_window import run_ascii_window
+        frame_ring = FrameRing(slots=3)
+        process = multiprocessing.Process(target=run_ascii_window, args=(frame_ring, event_bus))
+        feed = lambda: replay_frames(path, frame_ring, speed, loop, stop_event)
+        cleanup = frame_ring.close
+
+    process.start()
+    try:
+        start = time.perf_counter()
+        sent = feed()
+        print(f"Replayed {sent} entries in {time.perf_counter() - start:.2f}s; close the window to exit")
+        process.join()
+    except KeyboardInterrupt:
+        stop_event.set()
+        process.terminate()
+        process.join()
+    finally:
+        cleanup()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    info_parser = commands.add_parser('info', help='Summarize a recording')
+    info_parser.add_argument('path')
+    replay_parser = commands.add_parser('replay', help='Replay a recording into a view')
+    replay_parser.add_argument('path')
+    replay_parser.add_argument('--view', choices=['visualization', 'ascii'], default='visualization')
+    replay_parser.add_argument('--speed', type=float, default=1.0,
+                               help='Playback speed relative to real time; 0 for as fast as possible')
+    replay_parser.add_argument('--loop', action='store_true', help='Loop the frames (ascii view)')
+    args = parser.parse_args()
+
+    if args.command == 'info':
+        info(args.path)
+    else:
+        replay(args.path, args.view, args.speed, args.loop)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+import os
+import sys
+import time
+
+_IMPORT_TIME = time.perf_counter()
+
+def process_uptime():
+    """Seconds since this process was created, including interpreter start and imports"""
+    try:
+        # Field 22 of /proc/self/stat is the start time in clock ticks since boot
+        with open('/proc/self/stat') as f:
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        # Not Linux: count from the first import of this module instead
+        return time.perf_counter() - _IMPORT_TIME
+
+class StartupReport:
+    """
+    Per-process startup timing. Create it first thing in a process entry
+    point, mark() each init phase, and report() once the process is ready.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.phases = [('imports', process_uptime())]
+        self._last = time.perf_counter()
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    def report(self):
+        total = process_uptime()
+        phases = ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in self.phases)
+        torch_loaded = 'yes' if 'torch' in sys.modules else 'no'
+        print(f"[{self.name}] ready in {total:.2f}s ({phases}; torch imported: {torch_loaded})")
+        return {'process': self.name, 'total': total, 'phases': dict(self.phases),
+                'torch_imported': torch_loaded == 'yes'}
@@ -0,0 +1,220 @@
+import multiprocessing
+import os
+import time
+
+# Thread-pool size variables read by OpenMP (torch), MKL, OpenBLAS, numexpr and Accelerate at import
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS',
+                   'NUMEXPR_NUM_THREADS', 'VECLIB_MAXIMUM_THREADS')
+
+def parse_cpu_list(text):
+    """'0-3,6' -> {0, 1, 2, 3, 6}"""
+    cpus = set()
+    for part in text.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        first, _, last = part.partition('-')
+        cpus.update(range(int(first), int(last or first) + 1))
+    return cpus
+
+class WorkerControl:
+    """
+    Handed to each supervised process as its `control` keyword argument.
+    The process calls beat() from its main loop and leaves the loop once
+    stop_requested is true.
+    """
+    def __init__(self, stop_event, beats, index):
+        self.stop_event = stop_event
+        self.beats = beats
+        self.index = index
+
+    def beat(self):
+        self.beats[self.index] = time.time()
+
+    @property
+    def stop_requested(self):
+        return self.stop_event.is_set()
+
+def _worker_main(target, args, kwargs, cpus, threads, control):
+    if cpus and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cpus)
+    if threads:
+        import cv2
+        cv2.setNumThreads(threads)
+    # No beat here: the first one comes from the target's loop, so model loading and
+    # window setup before it are covered by startup_grace rather than heartbeat_timeout
+    target(*args, control=control, **kwargs)
+
+class Worker:
+    def __init__(self, index, name, target, args, kwargs, cpus, threads, essential, restart):
+        self.index = index
+        self.name = name
+        self.target = target
+        self.args = args
+        self.kwargs = kwargs
+        self.cpus = cpus
+        self.threads = threads
+        self.essential = essential
+        self.restart = restart
+        self.process = None
+        self.started_at = None
+        self.restarts = 0
+        self.backoff = None
+        self.restart_at = None
+        self.done = False
+
+class Supervisor:
+    """
+    Starts worker processes and keeps them healthy.
+
+    Every worker gets a WorkerControl. A worker that exits with an error,
+    or whose heartbeat is older than heartbeat_timeout (after startup_grace
+    seconds to load models and open windows), is restarted after a backoff.
+    The backoff doubles from `backoff` up to max_backoff and resets once the
+    worker has stayed up for healthy_after seconds. A worker that exits
+    cleanly is done; when an essential one finishes or runs out of
+    max_restarts, everything is shut down.
+
+    cpus pins a worker to a CPU set with sched_setaffinity. threads caps its
+    torch / BLAS / OpenCV thread pools, so the detector and the pygame loops
+    stop fighting over the same cores.
+
+    Shutdown sets a shared stop event and waits for workers to leave their
+    loops and clean up. terminate() is only the fallback after
+    shutdown_timeout, or for a worker whose heartbeat stopped.
+    Locks such a worker dies holding are only ever waited on with a timeout (see event_bus).
+    """
+    def __init__(self, heartbeat_timeout=10.0, startup_grace=60.0, backoff=1.0, max_backoff=30.0,
+                 max_restarts=5, healthy_after=60.0, shutdown_timeout=5.0, poll_interval=0.5):
+        self.heartbeat_timeout = heartbeat_timeout
+        self.startup_grace = startup_grace
+        self.initial_backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_restarts = max_restarts
+        self.healthy_after = healthy_after
+        self.shutdown_timeout = shutdown_timeout
+        self.poll_interval = poll_interval
+        self.stop_event = multiprocessing.Event()
+        self.workers = []
+        self.beats = None
+
+    def add(self, name, target, args=(), kwargs=None, cpus=None, threads=None, essential=False, restart=True):
+        """Register a worker; target must accept a `control` keyword argument. Returns its Worker"""
+        worker = Worker(len(self.workers), name, target, tuple(args), dict(kwargs or {}),
+                        set(cpus) if cpus else None, threads, essential, restart)
+        self.workers.append(worker)
+        return worker
+
+    def start(self):
+        self.beats = multiprocessing.Array('d', len(self.workers), lock=False)
+        for worker in self.workers:
+            self._start(worker)
+        return self
+
+    def _start(self, worker):
+        control = WorkerControl(self.stop_event, self.beats, worker.index)
+        worker.process = multiprocessing.Process(
+            target=_worker_main, name=worker.name,
+            args=(worker.target, worker.args, worker.kwargs, worker.cpus, worker.threads, control))
+
+        # Spawned children inherit the environment as it is at start(), before
+        # they import numpy or torch and size their thread pools from it
+        saved = {var: os.environ.get(var) for var in THREAD_ENV_VARS}
+        if worker.threads:
+            os.environ.update({var: str(worker.threads) for var in THREAD_ENV_VARS})
+        try:
+            worker.process.start()
+        finally:
+            for var, value in saved.items():
+                if value is None:
+                    os.environ.pop(var, None)
+                else:
+                    os.environ[var] = value
+
+        worker.started_at = time.time()
+        worker.restart_at = None
+        self.beats[worker.index] = 0.0
+        placement = f" on CPUs {sorted(worker.cpus)}" if worker.cpus else ''
+        budget = f", {worker.threads} threads" if worker.threads else ''
+        print(f"Supervisor: started {worker.name} (pid {worker.process.pid}{placement}{budget})")
+
+    def _hung(self, worker, now):
+        last_beat = self.beats[worker.index]
+        if last_beat == 0.0:
+            # Still starting up
+            return now - worker.started_at > self.startup_grace
+        return now - last_beat > self.heartbeat_timeout
+
+    def poll(self):
+        """Check every worker once; returns False when the supervisor should shut down"""
+        now = time.time()
+        for worker in self.workers:
+            if worker.done:
+                continue
+
+            if worker.restart_at is not None:
+                if now >= worker.restart_at:
+                    self._start(worker)
+                continue
+
+            process = worker.process
+            if process.is_alive():
+                if not self._hung(worker, now):
+                    if worker.backoff and now - worker.started_at > self.healthy_after:
+                        worker.backoff = None
+                    continue
+                print(f"Supervisor: {worker.name} missed its heartbeat for "
+                      f"{now - max(self.beats[worker.index], worker.started_at):.0f}s, killing it")
+                process.terminate()
+                process.join(self.shutdown_timeout)
+                if process.is_alive():
+                    process.kill()
+                    process.join()
+            elif process.exitcode == 0:
+                print(f"Supervisor: {worker.name} finished")
+                worker.done = True
+                if worker.essential:
+                    return False
+                continue
+            else:
+                print(f"Supervisor: {worker.name} exited with code {process.exitcode}")
+
+            if not worker.restart or worker.restarts >= self.max_restarts:
+                print(f"Supervisor: not restarting {worker.name} ({worker.restarts} restarts so far)")
+                worker.done = True
+                if worker.essential:
+                    return False
+                continue
+
+            worker.backoff = min(worker.backoff * 2, self.max_backoff) if worker.backoff else self.initial_backoff
+            worker.restarts += 1
+            worker.restart_at = now + worker.backoff
+            print(f"Supervisor: restarting {worker.name} in {worker.backoff:.1f}s "
+                  f"(restart {worker.restarts}/{self.max_restarts})")
+        return not all(worker.done for worker in self.workers)
+
+    def run(self, keep_running=None):
+        """Supervise until an essential worker finishes, keep_running() turns false, or Ctrl-C"""
+        try:
+            while self.poll() and (keep_running is None or keep_running()):
+                time.sleep(self.poll_interval)
+        except KeyboardInterrupt:
+            print("Keyboard interrupt detected. Stopping workers...")
+        finally:
+            self.stop()
+
+    def stop(self):
+        self.stop_event.set()
+        deadline = time.time() + self.shutdown_timeout
+        for worker in self.workers:
+            process = worker.process
+            if process is None:
+                continue
+            process.join(max(deadline - time.time(), 0))
+            if process.is_alive():
+                print(f"Supervisor: {worker.name} did not stop in time, terminating it")
+                process.terminate()
+                process.join()
+
+    def restart_counts(self):
+        return {worker.name: worker.restarts for worker in self.workers}
@@ -0,0 +1,49 @@
+import random
+import numpy as np
+from array_automaton import ArrayEngine, SWEEP, neighbor_counts, sweep_phases
+from pygame_visualization import CellEngine
+
+def test_same_phase_lines_are_sweep_apart_across_the_seam():
+    for size in range(SWEEP, 40):
+        phases = sweep_phases(size)
+        for i in range(size):
+            for j in range(i + 1, size):
+                if phases[i] == phases[j]:
+                    assert min(j - i, size - (j - i)) >= SWEEP, (size, i, j)
+
+def paired_engines(grid_width, grid_height, density, seed):
+    """A seeded CellEngine and an ArrayEngine holding the same cells"""
+    random.seed(seed)
+    cells = CellEngine(grid_width, grid_height)
+    for _ in range(int(grid_width * grid_height * density)):
+        cells.place(random.randrange(80))
+    array = ArrayEngine(grid_width, grid_height, seed=seed)
+    for row in cells.grid:
+        for cell in row:
+            if cell is not None:
+                array.class_ids[cell.grid_y, cell.grid_x] = cell.class_id
+                array.just_placed[cell.grid_y, cell.grid_x] = cell.just_placed
+    return cells, array
+
+def settled_stats(occupied):
+    """Fraction of cells with 2 or 3 neighbors, and the mean neighbor count"""
+    counts = neighbor_counts(occupied)[occupied]
+    return ((counts >= 2) & (counts <= 3)).mean(), counts.mean()
+
+def test_array_engine_matches_cell_engine_statistically():
+    # 61 columns leave a seam column, so the extra sweep phase is exercised
+    for density in (0.3, 0.5):
+        reference, candidate = [], []
+        for seed in range(3):
+            cells, array = paired_engines(61, 40, density, seed)
+            for _ in range(60):
+                cells.step()
+                array.step()
+            reference.append(settled_stats(np.array([[cell is not None for cell in row] for row in cells.grid])))
+            candidate.append(settled_stats(array.occupied))
+            assert array.occupied.sum() == int(61 * 40 * density)
+
+        reference_settled, reference_neighbors = np.mean(reference, axis=0)
+        candidate_settled, candidate_neighbors = np.mean(candidate, axis=0)
+        assert abs(candidate_settled - reference_settled) < 0.05, density
+        assert abs(candidate_neighbors - reference_neighbors) < 0.1, density
@@ -0,0 +1,32 @@
+from batch_detect import packet_keyframes, plan_chunks
+
+def test_keyframes_are_counted_in_presentation_order():
+    # Decode order I P B B I P B: the B-frames are shown before the P-frame they follow
+    lines = ['0,K_', '3000,__', '1000,__', '2000,__', '4000,K_', '6000,__', '5000,__']
+    assert packet_keyframes(lines) == [0, 4]
+
+def test_stream_start_time_does_not_shift_keyframes():
+    assert packet_keyframes(['90000,K_', '93600,__', '97200,K_']) == [0, 2]
+
+def test_streams_without_pts_use_decode_order():
+    assert packet_keyframes(['N/A,K_', 'N/A,__', 'N/A,__', 'N/A,K_']) == [0, 3]
+
+def test_partly_timed_streams_are_not_trusted():
+    assert packet_keyframes(['0,K_', 'N/A,__', '2000,K_']) is None
+
+def test_no_keyframes_or_packets():
+    assert packet_keyframes(['0,__', '1000,__']) is None
+    assert packet_keyframes([]) is None
+
+def test_chunks_start_on_keyframes_and_the_last_one_is_open_ended():
+    assert plan_chunks(100, 30, [0, 25, 50, 75]) == [(0, 50), (50, None)]
+
+def test_keyframes_past_the_estimated_frame_count_start_no_chunk():
+    assert plan_chunks(100, 30, [0, 40, 90, 130]) == [(0, 40), (40, 90), (90, None)]
+
+def test_fixed_chunks_without_keyframes():
+    assert plan_chunks(100, 30) == [(0, 30), (30, 60), (60, 90), (90, None)]
+
+def test_unknown_frame_count_is_a_single_chunk():
+    assert plan_chunks(0, 30, [0, 50]) == [(0, None)]
+    assert plan_chunks(-1, 30) == [(0, None)]
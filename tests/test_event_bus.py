@@ -0,0 +1,30 @@
+import multiprocessing
+import os
+import time
+from event_bus import EventBus, put_drop_oldest
+
+def die_holding_locks(bus, queue):
+    bus.states['person_present'].get_lock().acquire()
+    queue._rlock.acquire()
+    os._exit(0)
+
+def test_publishers_give_up_on_locks_a_dead_process_holds():
+    bus = EventBus(max_events=2)
+    bus.add_state('person_present')
+    queue = multiprocessing.Queue(maxsize=1)
+    queue.put('old')
+    time.sleep(0.1)
+    process = multiprocessing.Process(target=die_holding_locks, args=(bus, queue))
+    process.start()
+    process.join()
+
+    assert bus.publish('person_present', True) is False
+    assert bus.lock_timeouts.value == 1
+    # The full queue cannot be drained, so the new item is counted as lost
+    assert put_drop_oldest(queue, 'new') == 1
+
+def test_put_drop_oldest_evicts_the_oldest():
+    queue = multiprocessing.Queue(maxsize=2)
+    assert [put_drop_oldest(queue, i) for i in range(4)] == [0, 0, 1, 1]
+    time.sleep(0.1)
+    assert [queue.get(timeout=1), queue.get(timeout=1)] == [2, 3]
@@ -0,0 +1,65 @@
+import socket
+import time
+import numpy as np
+from detections import to_detection_array
+from net_stream import HELLO, SUBSCRIBE, WANT_DETECTIONS, WANT_FRAMES, StreamClient, StreamServer
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.01)
+
+def test_detections_and_raw_frames_round_trip():
+    server = StreamServer('tcp://127.0.0.1:0', jpeg_quality=None).start()
+    client = StreamClient(f'tcp://127.0.0.1:{server.port}', detections=True, frames=True).start()
+    try:
+        wait_for(lambda: server.subscribers)
+        detections = to_detection_array(np.array([[10, 20, 50, 120, 0.9, 0, 3],
+                                                  [60, 20, 90, 80, 0.7, 2, 4]], dtype=np.float32), 7)
+        frame = np.random.default_rng(0).integers(0, 256, (48, 64, 3), dtype=np.uint8)
+        server.publish_detections(7, 123.5, detections)
+        server.publish_frame(8, 124.0, frame)
+
+        seq, capture_time, received = client.detection_queue.get(timeout=5)
+        assert (seq, capture_time) == (7, 123.5)
+        assert received.dtype == detections.dtype
+        assert np.array_equal(received, detections)
+
+        wait_for(lambda: client.read_latest()[0] is not None)
+        seq, received_frame = client.read_latest()
+        assert seq == 8 and client.capture_time(8) == 124.0
+        assert np.array_equal(received_frame, frame)
+        assert client.read_latest(last_seq=8) == (None, None)
+    finally:
+        client.close()
+        server.stop()
+
+def test_subscriber_that_never_reads_does_not_block_publishers():
+    server = StreamServer('tcp://127.0.0.1:0', jpeg_quality=None, max_pending=4).start()
+    stalled = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    stalled.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    try:
+        stalled.connect(('127.0.0.1', server.port))
+        stalled.recv(HELLO.size, socket.MSG_WAITALL)
+        stalled.sendall(SUBSCRIBE.pack(WANT_DETECTIONS | WANT_FRAMES))
+        wait_for(lambda: server.subscribers)
+
+        detections = to_detection_array(np.tile([[10, 20, 50, 120, 0.9, 0]], (100, 1)).astype(np.float32), 0)
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        slowest = 0.0
+        for seq in range(500):
+            started = time.perf_counter()
+            server.publish_detections(seq, time.time(), detections)
+            server.publish_frame(seq, time.time(), frame)
+            slowest = max(slowest, time.perf_counter() - started)
+            time.sleep(0.001)
+
+        # Far more was published than the socket buffers hold, yet no call waited on the viewer
+        assert slowest < 0.1
+        stats = server.stats()[0]
+        assert stats['dropped_detections'] > 0
+        assert stats['dropped_frames'] > 0
+    finally:
+        stalled.close()
+        server.stop()
@@ -0,0 +1,27 @@
+import time
+from supervisor import Supervisor
+
+def beating_worker(startup, run_for, hang_after=None, control=None):
+    """Sleep through a slow startup, then beat for run_for seconds and exit cleanly"""
+    time.sleep(startup)
+    started = time.time()
+    while time.time() - started < run_for and not control.stop_requested:
+        if hang_after is not None and time.time() - started > hang_after:
+            time.sleep(60)
+        control.beat()
+        time.sleep(0.05)
+
+def supervise(*args, **kwargs):
+    supervisor = Supervisor(heartbeat_timeout=0.5, startup_grace=5.0, backoff=0.1, max_restarts=1,
+                            shutdown_timeout=2.0, poll_interval=0.05)
+    supervisor.add('worker', beating_worker, args, kwargs, essential=True)
+    supervisor.start()
+    supervisor.run()
+    return supervisor.restart_counts()['worker']
+
+def test_slow_start_is_covered_by_the_startup_grace():
+    # Startup takes three heartbeat timeouts, well inside the grace period
+    assert supervise(1.5, 0.5) == 0
+
+def test_missed_heartbeat_is_restarted():
+    assert supervise(0.0, 30.0, hang_after=0.2) == 1
@@ -0,0 +1,56 @@
+import numpy as np
+from detections import to_detection_array
+from tracker import IouTracker
+
+def run(tracker, frames, detect, frame_size=None):
+    """Feed `frames` sequence numbers through the tracker like the inference stage does"""
+    outputs, detect_frames = [], []
+    for seq in range(1, frames + 1):
+        if tracker.needs_detection(seq, frame_size):
+            detect_frames.append(seq)
+            raw = tracker.update(detect(seq), seq)
+        else:
+            raw = tracker.predict(seq)
+        outputs.append(to_detection_array(raw, seq))
+    return outputs, detect_frames
+
+def test_tracked_person_stays_in_the_output_between_detections():
+    def detect(seq):
+        x = 10.0 + seq
+        return np.array([[x, 20, x + 40, 120, 0.55, 0],
+                         [200, 200, 230, 230, 0.27, 2]], dtype=np.float32)
+
+    outputs, detect_frames = run(IouTracker(detect_every=5), 30, detect)
+    # The weak box neither shows up nor forces extra model runs
+    assert detect_frames == [1, 6, 11, 16, 21, 26]
+    assert all(len(detections) == 1 for detections in outputs)
+    assert {int(detections['track_id'][0]) for detections in outputs} == {1}
+
+def test_weak_detections_do_not_start_tracks():
+    tracker = IouTracker(detect_every=3)
+    tracked = tracker.update(np.array([[0, 0, 10, 10, 0.3, 0]], dtype=np.float32), 1)
+    assert tracked[0, 6] == -1
+    assert len(tracker.predict(2)) == 0
+
+def test_track_leaving_the_frame_triggers_early_detections_then_the_cadence():
+    # A person walks right at 2 px per frame and is gone once past x = 200
+    def detect(seq):
+        x = 100.0 + 2 * seq
+        if x >= 200:
+            return np.zeros((0, 6), dtype=np.float32)
+        return np.array([[x, 20, min(x + 40, 200), 120, 0.9, 0]], dtype=np.float32)
+
+    outputs, detect_frames = run(IouTracker(detect_every=10), 80, detect, frame_size=(200, 150))
+    # Early runs only while the box is half out of the frame (48, 50) and right after
+    # the person is gone (51); then the model is back to every 10th frame
+    assert detect_frames == [1, 11, 21, 31, 41, 48, 50, 51, 61, 71]
+    assert all(len(detections) == 0 for detections in outputs[49:])
+
+def test_losing_most_tracks_triggers_one_early_detection():
+    people = np.array([[0, 0, 40, 100, 0.9, 0],
+                       [100, 0, 140, 100, 0.9, 0],
+                       [200, 0, 240, 100, 0.9, 0]], dtype=np.float32)
+    # Two of the three people vanish at frame 6; the tracker keeps coasting them otherwise
+    outputs, detect_frames = run(IouTracker(detect_every=5), 20, lambda seq: people if seq < 6 else people[:1])
+    assert detect_frames == [1, 6, 7, 12, 17]
+    assert all(len(detections) == 1 for detections in outputs[6:])
@@ -0,0 +1,139 @@
+import numpy as np
+from detections import CONFIDENCE_THRESHOLD, box_iou
+
+class Track:
+    __slots__ = ('track_id', 'box', 'velocity', 'class_id', 'confidence', 'last_seq', 'hits')
+
+    def __init__(self, track_id, box, class_id, confidence, seq):
+        self.track_id = track_id
+        self.box = box
+        self.velocity = np.zeros(4, dtype=np.float32)  # per-frame change of x1, y1, x2, y2
+        self.class_id = class_id
+        self.confidence = confidence
+        self.last_seq = seq
+        self.hits = 1
+
+class IouTracker:
+    """
+    Cheap CPU tracker that keeps boxes alive between model runs.
+
+    On detection frames, update() associates detections with the predicted
+    positions of existing tracks (greedy, same class, IoU >= iou_threshold)
+    and smooths each track's velocity with an alpha filter. Only detections
+    above start_confidence (the output threshold of to_detection_array)
+    start new tracks; weaker ones keep a matching track alive. In between,
+    predict() moves every track along its velocity and reports the
+    confidence of its last detection, so a tracked box passes the output
+    filter exactly when it did on the detection frame. The model runs again
+    every detect_every frames, and sooner when the predictions stop being
+    trustworthy: a live track's predicted box shrinks to nothing or has less
+    than min_visible of its area left inside the frame, or the last update
+    left more than lost_fraction of the live tracks unmatched. Each of these
+    clears with the detection it triggers, so they cannot keep the model
+    running every frame. Tracks unmatched for more than max_age frames are
+    dropped.
+
+    Both return the backend (N, 6) layout plus a seventh track_id column,
+    -1 for detections that start no track.
+    """
+    def __init__(self, detect_every=5, iou_threshold=0.3, max_age=15, smoothing=0.6,
+                 start_confidence=CONFIDENCE_THRESHOLD, min_visible=0.5, lost_fraction=0.5):
+        self.detect_every = detect_every
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.smoothing = smoothing
+        self.start_confidence = start_confidence
+        self.min_visible = min_visible
+        self.lost_fraction = lost_fraction
+        self.tracks = []
+        self.next_id = 1
+        self.last_detection_seq = None
+        self.tracks_lost = False
+
+    def needs_detection(self, seq, frame_size=None):
+        """Whether frame seq needs the model; frame_size (width, height) enables the visibility check"""
+        if self.last_detection_seq is None or seq - self.last_detection_seq >= self.detect_every:
+            return True
+        if self.tracks_lost:
+            return True
+        for track in self._live_tracks():
+            box = self._predict(track, seq)
+            area = max(box[2] - box[0], 0) * max(box[3] - box[1], 0)
+            if area <= 0:
+                return True
+            if frame_size is not None:
+                width, height = frame_size
+                visible = (max(min(box[2], width) - max(box[0], 0), 0)
+                           * max(min(box[3], height) - max(box[1], 0), 0))
+                if visible < self.min_visible * area:
+                    return True
+        return False
+
+    def _live_tracks(self):
+        return [track for track in self.tracks if track.last_seq == self.last_detection_seq]
+
+    def _predict(self, track, seq):
+        return track.box + track.velocity * (seq - track.last_seq)
+
+    def update(self, raw_detections, seq):
+        """Associate a detection frame's (N, 6) array with the tracks"""
+        boxes = raw_detections[:, :4]
+        class_ids = raw_detections[:, 5].astype(np.int64)
+
+        live = len(self._live_tracks())
+        matched_tracks = set()
+        matched_detections = {}
+        if self.tracks and len(raw_detections):
+            predicted = np.array([self._predict(track, seq) for track in self.tracks], dtype=np.float32)
+            ious = box_iou(predicted, boxes)
+            track_classes = np.array([track.class_id for track in self.tracks])
+            ious[track_classes[:, None] != class_ids[None, :]] = 0
+
+            # Greedy association, best overlap first
+            for flat in np.argsort(ious, axis=None)[::-1]:
+                t, d = np.unravel_index(flat, ious.shape)
+                if ious[t, d] < self.iou_threshold:
+                    break
+                if t in matched_tracks or d in matched_detections:
+                    continue
+                matched_tracks.add(t)
+                matched_detections[d] = t
+
+        track_ids = np.empty(len(raw_detections), dtype=np.float32)
+        for d in range(len(raw_detections)):
+            box = boxes[d].astype(np.float32)
+            if d in matched_detections:
+                track = self.tracks[matched_detections[d]]
+                frames = max(seq - track.last_seq, 1)
+                track.velocity = (self.smoothing * (box - track.box) / frames
+                                  + (1 - self.smoothing) * track.velocity)
+                track.box = box
+                track.confidence = float(raw_detections[d, 4])
+                track.last_seq = seq
+                track.hits += 1
+            elif raw_detections[d, 4] > self.start_confidence:
+                track = Track(self.next_id, box, int(class_ids[d]), float(raw_detections[d, 4]), seq)
+                self.next_id += 1
+                self.tracks.append(track)
+            else:
+                track_ids[d] = -1
+                continue
+            track_ids[d] = track.track_id
+
+        # Live tracks this frame did not match still carry the previous detection's seq
+        lost = sum(1 for track in self.tracks if track.last_seq == self.last_detection_seq)
+        self.tracks_lost = live > 0 and lost > self.lost_fraction * live
+        self.tracks = [track for track in self.tracks if seq - track.last_seq <= self.max_age]
+        self.last_detection_seq = seq
+        return np.column_stack([raw_detections[:, :6], track_ids]).astype(np.float32)
+
+    def predict(self, seq):
+        """Predicted boxes of the tracks seen in the last detection frame"""
+        tracks = self._live_tracks()
+        tracked = np.empty((len(tracks), 7), dtype=np.float32)
+        for i, track in enumerate(tracks):
+            tracked[i, :4] = np.maximum(self._predict(track, seq), 0)
+            tracked[i, 4] = track.confidence
+            tracked[i, 5] = track.class_id
+            tracked[i, 6] = track.track_id
+        return tracked
@@ -1,17 +1,20 @@
 import cv2
-import torch
 import numpy as np
-from queue import Empty as QueueEmpty
-
-# Load YOLOv5 model
-model = torch.hub.load('ultralytics/yolov5', 'yolov5n', force_reload=False)
-model = model.to('cpu')  # Force CPU usage
-
-class DetectedObject:
-    def __init__(self, bbox, class_id, confidence):
-        self.bbox = bbox
-        self.class_id = class_id
-        self.confidence = confidence
+import os
+import threading
+import time
+from functools import lru_cache
+from pipeline import LatestSlot, StageThread
+from inference_backends import COCO_CLASSES, create_backend
+from model_loader import WEIGHTS_PATH, load_model
+from startup import StartupReport
+from metrics import MetricsRegistry, start_publisher
+from detections import contains_class, to_detection_array
+from detections import DetectedObject  # noqa: F401 (used to live here)
+from tracker import IouTracker
+from adaptive_size import AdaptiveInputSize
+from recording import Recorder, ReplayCapture
+from net_stream import StreamServer
 
 def create_resizable_window():
     # Create a resizable window
@@ -59,65 +62,287 @@ def scale_frame(frame, window_size):
                                  cv2.BORDER_CONSTANT, value=(0, 0, 0))
     
     return final
-def yolo_detection(detection_queue, frame_queue, person_detected_queue):
-    # Initialize webcam
-    cap = cv2.VideoCapture(0)
+
+@lru_cache(maxsize=None)
+def box_color(class_id):
+    # Stable per-class color, spread around the hue circle
+    hue = (class_id * 47) % 180
+    return tuple(int(c) for c in cv2.cvtColor(np.uint8([[[hue, 220, 255]]]), cv2.COLOR_HSV2BGR)[0, 0])
+
+def draw_boxes(image, detections, scale_x=1.0, scale_y=1.0):
+    """
+    Draw an (N, 6) backend detection array onto image in place, in the
+    style of the yolov5 results.render(). Box coordinates are multiplied by
+    scale_x / scale_y first, so boxes in frame pixels can be drawn onto a
+    resized copy. A seventh column is shown as the track id.
+    """
+    for det in detections:
+        x1, y1, x2, y2, confidence, class_id = det[:6]
+        class_id = int(class_id)
+        color = box_color(class_id)
+        name = COCO_CLASSES[class_id] if class_id < len(COCO_CLASSES) else str(class_id)
+        label = f"{name} {confidence:.2f}" if len(det) < 7 else f"{name} #{int(det[6])} {confidence:.2f}"
+        p1 = (int(x1 * scale_x), int(y1 * scale_y))
+        p2 = (int(x2 * scale_x), int(y2 * scale_y))
+        cv2.rectangle(image, p1, p2, color, 2, cv2.LINE_AA)
+        (text_w, text_h), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
+        text_top = p1[1] - text_h - 4 if p1[1] - text_h - 4 >= 0 else p1[1]
+        cv2.rectangle(image, (p1[0], text_top), (p1[0] + text_w + 2, text_top + text_h + 4), color, -1)
+        cv2.putText(image, label, (p1[0] + 1, text_top + text_h + 1),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1, cv2.LINE_AA)
+    return image
+
+def draw_detections(frame, detections):
+    """Draw an (N, 6) backend detection array onto a copy of the frame"""
+    return draw_boxes(frame.copy(), detections)
+
+class LetterboxCanvas:
+    """
+    Window-sized display buffer that scale_frame() renders into without
+    allocating.
+
+    The canvas and the view of its image region are built once per
+    (window size, frame shape). Each frame is resized straight into that
+    view and the boxes are drawn on it at display scale, so the black bars
+    are never touched again and the source frame is never copied.
+    """
+    def __init__(self):
+        self.canvas = None
+        self.roi = None
+        self.key = None
+        self.scale_x = self.scale_y = 1.0
+
+    def _layout(self, frame_shape, window_size):
+        window_width, window_height = max(window_size[0], 1), max(window_size[1], 1)
+        frame_height, frame_width = frame_shape[:2]
+
+        # Same geometry as scale_frame
+        if frame_width / frame_height > window_width / window_height:
+            new_width = window_width
+            new_height = max(int(window_width / (frame_width / frame_height)), 1)
+            left, top = 0, (window_height - new_height) // 2
+        else:
+            new_height = window_height
+            new_width = max(int(window_height * (frame_width / frame_height)), 1)
+            left, top = (window_width - new_width) // 2, 0
+
+        self.canvas = np.zeros((window_height, window_width) + tuple(frame_shape[2:]), dtype=np.uint8)
+        self.roi = self.canvas[top:top + new_height, left:left + new_width]
+        self.scale_x = new_width / frame_width
+        self.scale_y = new_height / frame_height
+
+    def render(self, frame, detections, window_size):
+        """Letterbox frame into the canvas with its boxes drawn; returns the canvas"""
+        key = (tuple(window_size), frame.shape)
+        if key != self.key:
+            self._layout(frame.shape, window_size)
+            self.key = key
+        roi_height, roi_width = self.roi.shape[:2]
+        cv2.resize(frame, (roi_width, roi_height), dst=self.roi, interpolation=cv2.INTER_AREA)
+        draw_boxes(self.roi, detections, self.scale_x, self.scale_y)
+        return self.canvas
+
+def yolo_detection(detection_queue, frame_ring, event_bus, backend='torch', model_path=None,
+                   metrics_queue=None, detect_every=1, tracking=False, motion_gate=None,
+                   target_latency=None, source=0, replay_speed=1.0, record=None,
+                   record_jpeg_quality=None, threads=None, stream=None, stream_jpeg_quality=80,
+                   control=None):
+    """
+    Pipelined detector. A capture thread keeps only the newest camera frame,
+    an inference thread runs the model on whatever frame is newest when it
+    is free, and the display runs here on the main thread (HighGUI needs it).
+    Stages are joined by LatestSlots, so a slow stage drops stale work
+    instead of queueing it.
+
+    backend: 'torch' (eager hub model), or 'onnxruntime' / 'openvino' running
+    the ONNX graph at model_path written by export_model.py
+
+    detect_every > 1 (or tracking=True) runs the model only every
+    detect_every frames and keeps boxes alive in between with an IouTracker
+    that assigns stable track ids.
+
+    motion_gate: optional MotionGate. Frames it finds static reuse the last
+    results instead of running inference (or the tracker).
+
+    target_latency (seconds): adapt the inference input size between 320
+    and 640 to keep inference within this budget. Needs a backend with a
+    dynamic input size (torch, or an ONNX graph exported with --dynamic).
+
+    source: camera index or video path for cv2.VideoCapture, or a recording
+    directory (see recording.py) replayed at replay_speed (0 for as fast as
+    possible). record: directory to append every captured frame and every
+    detection array to, frames JPEG-compressed if record_jpeg_quality is set.
+
+    stream: address ('tcp://host:port' or 'unix:///path') to serve the
+    detections and JPEG frames on for remote viewers (see net_stream.py).
+
+    threads: intra-op thread count for the onnxruntime / openvino backends.
+    control: WorkerControl from supervisor.py; the display loop beats it and
+    exits when a stop is requested.
+
+    Every frame gets a sequence number and capture time (time.time()) that
+    travel with its detections through detection_queue as (seq,
+    capture_time, detections) tuples, with detections as a DETECTION_DTYPE
+    array (see detections.py). Person presence is published to the
+    'person_present' state topic of event_bus, tagged with the same seq. Stage
+    timings go to a MetricsRegistry, published through metrics_queue if given.
+    """
+    startup = StartupReport('detector')
+
+    # Load YOLOv5 model (torch is only imported for the torch backend)
+    if backend == 'torch':
+        detector = create_backend(backend, model=load_model(model_path or WEIGHTS_PATH))
+    else:
+        detector = create_backend(backend, model_path=model_path or 'yolov5n.onnx', threads=threads)
+    startup.mark('model')
+
+    # Initialize webcam, or a recording standing in for it
+    if isinstance(source, str) and os.path.isdir(source):
+        cap = ReplayCapture(source, speed=replay_speed)
+    else:
+        cap = cv2.VideoCapture(source)
+    # Ask the driver not to buffer frames behind our back
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    recorder = Recorder(record, record_jpeg_quality) if record else None
+    stream_server = StreamServer(stream, stream_jpeg_quality).start() if stream else None
     
     # Create resizable window
     create_resizable_window()
+    startup.mark('camera and window')
+    startup.report()
     
-    while True:
+    metrics = MetricsRegistry('detector')
+    read_time = metrics.histogram('read_seconds', 'Camera read time')
+    infer_time = metrics.histogram('infer_seconds', 'Model inference time')
+    postprocess_time = metrics.histogram('postprocess_seconds', 'Detection extraction and queue puts')
+    render_time = metrics.histogram('render_seconds', 'Box drawing, scaling and imshow')
+    display_latency = metrics.histogram('capture_to_display_seconds', 'Capture to on-screen boxes')
+    inference_drops = metrics.counter('inference_dropped_frames', 'Frames replaced before inference took them')
+    display_drops = metrics.counter('display_dropped_results', 'Results replaced before display took them')
+    detected_frames = metrics.counter('detected_frames', 'Frames run through the model')
+    tracked_frames = metrics.counter('tracked_frames', 'Frames served by the tracker alone')
+    static_frames = metrics.counter('motion_skipped_frames', 'Static frames that reused the last results')
+    skip_ratio = metrics.gauge('motion_skip_ratio', 'Fraction of frames skipped by the motion gate')
+    inference_size = metrics.gauge('inference_size', 'Current inference input size (pixels)')
+    publisher = start_publisher(metrics, metrics_queue)
+
+    tracker = IouTracker(detect_every) if tracking or detect_every > 1 else None
+    last_raw_detections = None
+
+    size_controller = None
+    if target_latency is not None:
+        if getattr(detector, 'dynamic_size', False):
+            size_controller = AdaptiveInputSize(target_latency)
+            inference_size.set(size_controller.size)
+        else:
+            print(f"Backend '{backend}' has a fixed input size, ignoring target_latency")
+
+    stop_event = threading.Event()
+    frame_slot = LatestSlot('capture->inference')
+    result_slot = LatestSlot('inference->display')
+
+    def capture_step():
         # Read frame from webcam
-        ret, frame = cap.read()
+        with read_time.time():
+            ret, frame = cap.read()
         if not ret:
-            break
+            return False
+        capture_time = time.time()
 
-        # Get current window size
-        window_rect = cv2.getWindowImageRect('to be')
-        if window_rect is not None:
-            window_width = window_rect[2]
-            window_height = window_rect[3]
-        else:
-            # Default size if window rect not available
-            window_width, window_height = 800, 600
+        # Publish the current frame to the shared-memory ring
+        seq = frame_ring.write(frame, capture_time)
+        if recorder is not None:
+            recorder.write_frame(seq, capture_time, frame)
+        if stream_server is not None:
+            stream_server.publish_frame(seq, capture_time, frame)
+        frame_slot.put((seq, capture_time, frame))
 
-        # Perform YOLOv5 detection
-        results = model(frame)
+    def inference_step():
+        nonlocal last_raw_detections
+        item = frame_slot.get(timeout=0.1)
+        if item is None:
+            return
+        seq, capture_time, frame = item
 
-        # Process YOLOv5 results
-        detections = []
-        person_detected = False
-        for det in results.xyxy[0]:
-            if det[4] > 0.5:  # Confidence threshold
-                bbox = det[:4].cpu().numpy()
-                class_id = int(det[5].cpu().numpy())
-                confidence = float(det[4].cpu().numpy())
-                detections.append(DetectedObject(bbox, class_id, confidence))
+        # Perform YOLOv5 detection: (N, 6) array of x1, y1, x2, y2, confidence, class_id,
+        # plus a track_id column when tracking
+        # Every frame goes through the gate, so its reference is the frame that was inferred
+        static = motion_gate is not None and not motion_gate.should_infer(frame)
+        if static and last_raw_detections is not None:
+            # Nothing moved: keep the previous boxes
+            raw_detections = last_raw_detections
+            static_frames.inc()
+        elif tracker is not None and not tracker.needs_detection(seq, (frame.shape[1], frame.shape[0])):
+            raw_detections = tracker.predict(seq)
+            tracked_frames.inc()
+        else:
+            infer_start = time.perf_counter()
+            if size_controller is not None:
+                raw_detections = detector(frame, size=size_controller.size)
+            else:
+                raw_detections = detector(frame)
+            latency = time.perf_counter() - infer_start
+            infer_time.observe(latency)
+            if size_controller is not None:
+                inference_size.set(size_controller.observe(latency))
+            if tracker is not None:
+                raw_detections = tracker.update(raw_detections, seq)
+            detected_frames.inc()
+        last_raw_detections = raw_detections
+        if motion_gate is not None:
+            skip_ratio.set(motion_gate.skip_ratio)
+        postprocess_start = time.perf_counter()
 
-                if class_id == 0:  # Assuming 0 is the class_id for person
-                    person_detected = True
+        # Process YOLOv5 results: confidence filter and packing in one vectorized pass
+        detections = to_detection_array(raw_detections, seq)
+        person_detected = contains_class(detections, 0)  # 0 is the class_id for person
 
         # Send detection results to the visualization process
-        detection_queue.put(detections)
+        detection_queue.put((seq, capture_time, detections))
+        if recorder is not None:
+            recorder.write_detections(seq, capture_time, detections)
+        if stream_server is not None:
+            stream_server.publish_detections(seq, capture_time, detections)
 
-        # Send the current frame to the frame queue
-        if frame_queue.empty():
-            frame_queue.put(frame)
-        else:
-            try:
-                frame_queue.get_nowait()  # Remove the old frame
-                frame_queue.put(frame)  # Put the new frame
-            except QueueEmpty:
-                pass
+        # Publish person presence; subscribers only hear about enter/leave edges
+        event_bus.publish('person_present', person_detected, seq, capture_time)
+        postprocess_time.observe(time.perf_counter() - postprocess_start)
+
+        result_slot.put((capture_time, frame, raw_detections))
 
-        # Notify the ASCII window process about the person detection
-        person_detected_queue.put(person_detected)
+    canvas = LetterboxCanvas()
+    stages = [StageThread('capture', capture_step, stop_event),
+              StageThread('inference', inference_step, stop_event)]
+    for stage in stages:
+        stage.start()
 
-        # Display results with scaling
-        frame_with_boxes = results.render()[0]
-        # Scale the frame to fit the window
-        scaled_frame = scale_frame(frame_with_boxes, (window_width, window_height))
-        cv2.imshow('to be', scaled_frame)
+    while not stop_event.is_set():
+        if control is not None:
+            control.beat()
+            if control.stop_requested:
+                break
+        result = result_slot.get(timeout=0.1)
+
+        if result is not None:
+            capture_time, frame, raw_detections = result
+            render_start = time.perf_counter()
+
+            # Get current window size
+            window_rect = cv2.getWindowImageRect('to be')
+            if window_rect is not None:
+                window_width = window_rect[2]
+                window_height = window_rect[3]
+            else:
+                # Default size if window rect not available
+                window_width, window_height = 800, 600
+
+            # Letterbox into the reused window-sized canvas and draw the boxes at display scale
+            cv2.imshow('to be', canvas.render(frame, raw_detections, (window_width, window_height)))
+            render_time.observe(time.perf_counter() - render_start)
+            display_latency.observe(time.time() - capture_time)
+            # The slots keep running totals; the counters catch up by the difference
+            inference_drops.inc(frame_slot.dropped - inference_drops.value)
+            display_drops.inc(result_slot.dropped - display_drops.value)
 
         # Handle keyboard input
         key = cv2.waitKey(1) & 0xFF
@@ -129,5 +354,22 @@ def yolo_detection(detection_queue, frame_queue, person_detected_queue):
             else:
                 cv2.setWindowProperty('to be', cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
 
+    stop_event.set()
+    frame_slot.close()
+    result_slot.close()
+    for stage in stages:
+        stage.join(timeout=2.0)
+
+    print("Detector pipeline drops: " +
+          ", ".join(f"{slot.name} {slot.dropped}/{slot.put_count}" for slot in (frame_slot, result_slot)))
+
+    if publisher is not None:
+        publisher.stop()
     cap.release()
-    cv2.destroyAllWindows()
\ No newline at end of file
+    if stream_server is not None:
+        stream_server.stop()
+    if recorder is not None:
+        recorder.close()
+        print(f"Recorded {recorder.frames_written} frames to {record}")
+    frame_ring.close()
+    cv2.destroyAllWindows()